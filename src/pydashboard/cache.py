@@ -0,0 +1,53 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from pydashboard.models import DataTable
+
+
+class PageCache:
+    """分页数据缓存
+
+    按 key (页码, 以及查询条件等) 缓存 DataTable, 超过 size 时淘汰最久未使用的页,
+    缓存时间超过 ttl 秒的页视为过期。size 为 0 时不缓存, ttl 为 None 时不过期。
+    """
+
+    def __init__(self, size: int = 8, ttl: Optional[float] = 60):
+        self.size = size
+        self.ttl = ttl
+        self._pages: OrderedDict[Hashable, Tuple[float, DataTable]] = OrderedDict()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.monotonic() - created > self.ttl
+
+    def get(self, key: Hashable) -> Optional[DataTable]:
+        item = self._pages.get(key)
+        if item is None:
+            return None
+        if self._expired(item[0]):
+            del self._pages[key]
+            return None
+        self._pages.move_to_end(key)
+        return item[1]
+
+    def put(self, key: Hashable, dt: DataTable):
+        if self.size <= 0:
+            return
+        self._pages[key] = (time.monotonic(), dt)
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.size:
+            self._pages.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """使缓存失效, 不指定 key 时清空全部缓存"""
+        if key is None:
+            self._pages.clear()
+        else:
+            self._pages.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        item = self._pages.get(key)
+        return item is not None and not self._expired(item[0])
+
+    def __len__(self) -> int:
+        return len(self._pages)
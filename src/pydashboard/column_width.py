@@ -0,0 +1,202 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, QObject, Qt, QTimer
+from PyQt6.QtGui import QFont, QFontMetrics, QGuiApplication
+from PyQt6.QtWidgets import QTableView
+
+
+class TextWidthCache:
+    """按 (字体, 文本) 缓存文本宽度, 超过 size 时淘汰最久未使用的"""
+
+    def __init__(self, size: int = 20000):
+        self.size = size
+        self._widths: OrderedDict[Tuple[str, str], int] = OrderedDict()
+        self._metrics: Dict[str, QFontMetrics] = {}
+
+    def max_width(self, font: QFont, texts: Iterable[str]) -> int:
+        """texts 中最宽的文本宽度"""
+        font_key = font.key()
+        metrics = self._metrics.get(font_key)
+        if metrics is None:
+            metrics = self._metrics[font_key] = QFontMetrics(font)
+        widths = self._widths
+        result = 0
+        for text in texts:
+            key = (font_key, text)
+            width = widths.get(key)
+            if width is None:
+                width = max(metrics.horizontalAdvance(x) for x in text.split("\n"))
+                widths[key] = width
+                if len(widths) > self.size:
+                    widths.popitem(last=False)
+            else:
+                widths.move_to_end(key)
+            if width > result:
+                result = width
+        return result
+
+
+# 所有表格共用, 翻页后相同的文本不需要重新测量
+TEXT_WIDTHS = TextWidthCache()
+
+
+class ColumnWidths(QObject):
+    """估算并设置列宽, 代替 ResizeToContents
+
+    设置模型时每列只测量最多 sample 行, 列宽按列名记住, 翻页后只会加宽;
+    滚动到还没有测量过的行时再按需加宽。用户手动调整过的列不再自动调整。
+    """
+
+    # 表头排序箭头占用的宽度
+    SORT_INDICATOR = 16
+
+    def __init__(
+        self,
+        view: QTableView,
+        sample: int = 200,
+        max_width: int = 400,
+        padding: int = 16,
+    ):
+        super().__init__(view)
+        self.view = view
+        self.sample = sample
+        self.max_width = max_width
+        self.padding = padding
+        # {列名: 宽度}
+        self._widths: Dict[str, int] = {}
+        self._manual: Set[str] = set()
+        # 当前模型中已经测量过的行
+        self._measured: Set[int] = set()
+        self._model: Optional[QAbstractItemModel] = None
+        self._applying = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(50)
+        self._timer.timeout.connect(self.widen_visible)
+        vsb = view.verticalScrollBar()
+        if vsb:
+            vsb.valueChanged.connect(self._timer.start)
+        header = view.horizontalHeader()
+        if header:
+            header.sectionResized.connect(self._section_resized)
+
+    def set_model(self, model: Optional[QAbstractItemModel]):
+        if self._model is not None:
+            for signal, slot in self._connections():
+                signal.disconnect(slot)
+        self._model = model
+        if model is not None:
+            for signal, slot in self._connections():
+                signal.connect(slot)
+        self.fit()
+
+    def _connections(self):
+        model = self._model
+        return [
+            (model.modelReset, self.fit),
+            (model.layoutChanged, self._layout_changed),
+            (model.rowsInserted, self._rows_changed),
+            (model.rowsRemoved, self._rows_changed),
+            (model.dataChanged, self._data_changed),
+        ]
+
+    def _name(self, column: int) -> str:
+        headers = getattr(self._model, "display_headers", None)
+        if headers is not None and column < len(headers):
+            return headers[column].name
+        return str(self._model.headerData(column, Qt.Orientation.Horizontal))
+
+    def fit(self):
+        """重新抽样测量, 列宽只会增加"""
+        self._measured = set()
+        model = self._model
+        if model is None:
+            return
+        count = model.rowCount()
+        step = max(count // max(self.sample, 1), 1)
+        self._measure(list(range(0, count, step))[: self.sample], header=True)
+        self.widen_visible()
+
+    def widen_visible(self):
+        """测量当前显示的还没有测量过的行"""
+        model = self._model
+        viewport = self.view.viewport()
+        if model is None or viewport is None:
+            return
+        first = self.view.rowAt(0)
+        if first < 0:
+            return
+        last = self.view.rowAt(viewport.height() - 1)
+        if last < 0:
+            last = model.rowCount() - 1
+        rows = [x for x in range(first, last + 1) if x not in self._measured]
+        if rows:
+            self._measure(rows)
+
+    def _measure(self, rows: List[int], header: bool = False):
+        model = self._model
+        font = self.view.font()
+        header_view = self.view.horizontalHeader()
+        for column in range(model.columnCount()):
+            name = self._name(column)
+            if name in self._manual:
+                continue
+            values = (model.index(row, column).data() for row in rows)
+            width = TEXT_WIDTHS.max_width(
+                font, (str(x) for x in values if x is not None)
+            )
+            if header and header_view:
+                title = model.headerData(column, Qt.Orientation.Horizontal)
+                width = max(
+                    width,
+                    TEXT_WIDTHS.max_width(header_view.font(), [str(title or "")])
+                    + self.SORT_INDICATOR,
+                )
+            width = min(width + self.padding, self.max_width)
+            if width > self._widths.get(name, 0):
+                self._widths[name] = width
+        self._measured.update(rows)
+        self.apply()
+
+    def apply(self):
+        """按列名设置列宽"""
+        model = self._model
+        if model is None:
+            return
+        self._applying = True
+        try:
+            for column in range(model.columnCount()):
+                width = self._widths.get(self._name(column))
+                if (
+                    width
+                    and not self.view.isColumnHidden(column)
+                    and self.view.columnWidth(column) != width
+                ):
+                    self.view.setColumnWidth(column, width)
+        finally:
+            self._applying = False
+
+    def _layout_changed(self):
+        # 列的顺序可能发生了变化, 行号也不再对应
+        self._measured = set()
+        self.apply()
+        self._timer.start()
+
+    def _rows_changed(self):
+        self._measured = set()
+        self._timer.start()
+
+    def _data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex):
+        self._measured.difference_update(range(top_left.row(), bottom_right.row() + 1))
+        self._timer.start()
+
+    def _section_resized(self, column: int, old: int, new: int):
+        """记住用户拖动表头调整的列宽"""
+        if self._applying or self._model is None or not old or not new:
+            return
+        if not QGuiApplication.mouseButtons() & Qt.MouseButton.LeftButton:
+            return
+        name = self._name(column)
+        self._manual.add(name)
+        self._widths[name] = new
@@ -1,42 +1,326 @@
-import sys
+import decimal
+import itertools
+from bisect import bisect_right
+from collections import OrderedDict, deque
 from functools import partial
-from typing import Any, Callable, Dict, List, Mapping, Optional
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from loguru import logger
 from PyQt6.QtCore import (
-    QItemSelection,
-    QItemSelectionModel,
+    QAbstractTableModel,
+    QModelIndex,
+    QObject,
+    QPoint,
+    QPointF,
+    QRect,
     Qt,
     QTimer,
+    pyqtSignal,
+)
+from PyQt6.QtGui import (
+    QColor,
+    QGuiApplication,
+    QKeySequence,
+    QMouseEvent,
+    QPainter,
+    QPalette,
+    QShortcut,
+    QShowEvent,
+    QUndoCommand,
+    QUndoStack,
 )
-from PyQt6.QtGui import QColor, QPalette, QShowEvent, QStandardItem, QStandardItemModel
 from PyQt6.QtWidgets import (
     QAbstractItemView,
+    QApplication,
     QDialog,
-    QFrame,
+    QFileDialog,
     QHBoxLayout,
     QHeaderView,
+    QLineEdit,
     QMessageBox,
+    QProgressDialog,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionFocusRect,
+    QStyleOptionViewItem,
     QTableView,
     QVBoxLayout,
     QWidget,
 )
 
+from pydashboard import importer
+from pydashboard.cache import PageCache
+from pydashboard.column_width import ColumnWidths
 from pydashboard.components.button import MButton
 from pydashboard.components.button_group import ButtonGroup
 from pydashboard.components.dialog import DraggableListDialog, Item, SelectDialog
 from pydashboard.components.pagination import PagesWidget
-from pydashboard.job import DataTableThread, ListThread
-from pydashboard.models import DataTable
+from pydashboard.export import FORMATS, Exporter, list_rows, page_rows
+from pydashboard.formatters import Formatter, compile_formatters
+from pydashboard.job import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    DataTableThread,
+    ListThread,
+    ObjectThread,
+    fetch_page,
+)
+from pydashboard.models import DataTable, TableHeader
+from pydashboard.schema import Parser, compile_parsers
+from pydashboard.search import SearchIndex
+from pydashboard.sorting import SortColumns, SortIndex
 
 CustomRole = Qt.ItemDataRole.UserRole + 100
 
+# 选择时视图会对每个单元格调用 flags, 预先计算好避免每次组合枚举
+_READONLY_FLAGS = (
+    Qt.ItemFlag.ItemIsEnabled
+    | Qt.ItemFlag.ItemIsSelectable
+    | Qt.ItemFlag.ItemNeverHasChildren
+)
+_EDITABLE_FLAGS = _READONLY_FLAGS | Qt.ItemFlag.ItemIsEditable
+
+# 获取第 n 页数据 / 提交变更, 可以是普通函数或者 async def 函数
+FetchFunc = Callable[[int], Union[DataTable, Awaitable[DataTable]]]
+UpdateFunc = Callable[[List[Mapping]], Union[None, Awaitable[None]]]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, decimal.Decimal)) and not isinstance(
+        value, bool
+    )
+
+
+def _row_ranges(rows: Iterable[int]) -> List[Tuple[int, int]]:
+    """将行号合并为连续区间 [(起始行, 行数)], 按起始行升序"""
+    ranges: List[Tuple[int, int]] = []
+    for row in sorted(set(rows)):
+        if ranges and ranges[-1][0] + ranges[-1][1] == row:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + 1)
+        else:
+            ranges.append((row, 1))
+    return ranges
+
+
+# 单元格的修改: (行标识, 列名, 修改前的值, 修改后的值)
+Edit = Tuple[int, str, Any, Any]
+
+# 修改前没有未保存的编辑, 撤销时恢复为 source 中的值
+NO_EDIT = object()
+
+
+def _remap_entries(
+    entries: List[Tuple[int, int]], remap: Mapping[int, int]
+) -> Optional[List[Tuple[int, int]]]:
+    """按 remap 转换 source 的行标识, 有行已经不存在时返回 None"""
+    result = []
+    for at, row_id in entries:
+        if row_id >= 0:
+            if row_id not in remap:
+                return None
+            row_id = remap[row_id]
+        result.append((at, row_id))
+    return result
+
+
+class EditCommand(QUndoCommand):
+    """修改单元格, 只记录修改过的单元格"""
+
+    def __init__(self, model: "DataModel", edits: List[Edit]):
+        super().__init__("编辑" if len(edits) == 1 else f"编辑 {len(edits)} 个单元格")
+        self.model = model
+        self.edits = edits
+
+    def redo(self):
+        self.model._apply_edits([(r, n, new) for r, n, _, new in self.edits])
+
+    def undo(self):
+        self.model._apply_edits([(r, n, old) for r, n, old, _ in reversed(self.edits)])
+
+    def remap(self, remap: Mapping[int, int]) -> bool:
+        """刷新后 source 的行号变化, 有行已经不存在时返回 False"""
+        entries = _remap_entries([(i, x[0]) for i, x in enumerate(self.edits)], remap)
+        if entries is None:
+            return False
+        self.edits = [(r, *x[1:]) for (_, r), x in zip(entries, self.edits)]
+        return True
+
+
+class InsertRowsCommand(QUndoCommand):
+    """新增行, 记录新增的行标识、位置和值"""
+
+    def __init__(
+        self,
+        model: "DataModel",
+        entries: List[Tuple[int, int]],
+        values: Dict[int, Dict[str, Any]],
+    ):
+        super().__init__(f"新增 {len(entries)} 行")
+        self.model = model
+        # [(在全部行中的位置, 行标识)]
+        self.entries = entries
+        self.values = values
+
+    def redo(self):
+        self.model._restore_rows(self.entries, self.values)
+
+    def undo(self):
+        self.values = self.model._take_rows({x for _, x in self.entries})
+
+    def remap(self, remap: Mapping[int, int]) -> bool:
+        # 新增的行标识为负数, 刷新后不变
+        return True
+
+
+class RemoveRowsCommand(QUndoCommand):
+    """删除行, 记录删除的行标识、位置和这些行中未保存的编辑"""
+
+    def __init__(self, model: "DataModel", entries: List[Tuple[int, int]]):
+        super().__init__(f"删除 {len(entries)} 行")
+        self.model = model
+        self.entries = entries
+        self.values: Dict[int, Dict[str, Any]] = {}
+
+    def redo(self):
+        self.values = self.model._take_rows({x for _, x in self.entries})
 
-class DataModel(QStandardItemModel):
-    """带变更跟踪的数据模型"""
+    def undo(self):
+        self.model._restore_rows(self.entries, self.values)
 
-    def __init__(self, source: DataTable, top_headers: Optional[List[str]] = None):
+    def remap(self, remap: Mapping[int, int]) -> bool:
+        entries = _remap_entries(self.entries, remap)
+        if entries is None:
+            return False
+        self.entries = entries
+        self.values = {(remap[k] if k >= 0 else k): v for k, v in self.values.items()}
+        return True
+
+
+class ColumnModel(QAbstractTableModel):
+    """按 display_headers 的顺序显示列的模型基类"""
+
+    def __init__(self):
+        super().__init__()
+        self.display_headers: List[TableHeader] = []
+        # 每一列的格式化函数, 列变化时通过 set_formatters 重新生成
+        self._formatters: Dict[str, Formatter] = {}
+        self._parsers: Dict[str, Parser] = {}
+        self._right_aligned: Set[str] = set()
+        # 列名和显示名 -> 在 set_formatters 的 headers 中的位置
+        self._column_lookup: Dict[str, int] = {}
+
+    def all_headers(self) -> List[TableHeader]:
+        """全部的列, 按原始顺序"""
+        return self.display_headers
+
+    def set_formatters(self, headers: Sequence[TableHeader]):
+        self._formatters = compile_formatters(headers)
+        self._parsers = compile_parsers(headers)
+        # 数字右对齐
+        self._right_aligned = {
+            x.name for x in headers if x.precision is not None or x.thousands
+        }
+        lookup = {x.text(): i for i, x in reversed(list(enumerate(headers)))}
+        lookup.update({x.name: i for i, x in enumerate(headers)})
+        self._column_lookup = lookup
+
+    def column_index(self, name: str) -> int:
+        """按列名或显示名查找列在全部列中的位置, 找不到时返回 -1"""
+        return self._column_lookup.get(name, -1)
+
+    def format_value(self, name: str, value: Any) -> str:
+        """按列的格式显示值"""
+        formatter = self._formatters.get(name)
+        if formatter is None:
+            return "" if value is None else str(value)
+        return formatter(value)
+
+    def _alignment(self, name: str) -> Qt.AlignmentFlag:
+        if name in self._right_aligned:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        return Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.display_headers)
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            if 0 <= section < len(self.display_headers):
+                return self.display_headers[section].text()
+            return None
+        return section + 1
+
+    def header_names(self, all: bool = True) -> List[str]:
+        return [x.name for x in self.display_headers]
+
+    def header_labels(self, _all: bool = True) -> List[str]:
+        return [x.text() for x in self.display_headers]
+
+    def set_column_order(self, names: List[str]):
+        """调整列顺序, 只修改列的映射, 不重建数据
+
+        未列出的列按原顺序排在最后。视图中的列宽、隐藏状态和选中项跟随列移动。
+        """
+        headers = {x.name: x for x in self.all_headers()}
+        order = [headers[x] for x in names if x in headers]
+        order += [x for x in self.all_headers() if x.name not in names]
+        if [x.name for x in order] == self.header_names():
+            return
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        old_columns = [
+            (x.row(), self.display_headers[x.column()].name) for x in old_indexes
+        ]
+        self.display_headers = order
+        position = {x.name: i for i, x in enumerate(order)}
+        self.changePersistentIndexList(
+            old_indexes,
+            [self.index(row, position[name]) for row, name in old_columns],
+        )
+        self.layoutChanged.emit()
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(order) - 1)
+
+
+class DataModel(ColumnModel):
+    """带变更跟踪的数据模型
+
+    单元格不会预先创建, 只在视图请求时从 source 中读取并格式化。
+    每一行用一个行标识表示: 非负数为 source 中的行号, 负数为新增的行。
+    编辑、新增和删除记录在 undo_stack 中, 最多保留 undo_limit 步。
+    """
+
+    def __init__(
+        self,
+        source: DataTable,
+        top_headers: Optional[List[str]] = None,
+        undo_limit: int = 100,
+    ):
         super().__init__()
+        self.undo_stack = QUndoStack(self)
+        self.undo_stack.setUndoLimit(undo_limit)
         self.source = source
         if top_headers:
             self.display_headers = [
@@ -44,98 +328,924 @@ class DataModel(QStandardItemModel):
             ] + [x for x in self.source.headers if x.name not in top_headers]
         else:
             self.display_headers = self.source.headers
+        self.set_formatters(self.source.headers)
+
+        # 每一行对应的行标识
+        self._rows: List[int] = []
+        # 快速过滤时 _rows 只包含匹配的行, _order 保存全部的行; 未过滤时为 None
+        self._order: Optional[List[int]] = None
+        self._filter: Optional[Set[int]] = None
+        # 变更记录, 在编辑、新增、删除时实时更新, compare 只需遍历变更
+        # 编辑过且与原始值不同的值 {行标识: {列名: 值}}
+        self._values: Dict[int, Dict[str, Any]] = {}
+        # 新增的行标识, 按新增顺序
+        self._new_rows: Dict[int, None] = {}
+        # 被删除的 source 行号, 按删除顺序
+        self._removed_rows: Dict[int, None] = {}
+        self._next_new_row = -1
+        # 排序, _rows 即为排序后的行标识
+        self._sort_index = SortIndex(self._value)
+        self._sort_columns: SortColumns = ()
+        # 行标识 -> 当前显示的行号, 需要时建立, 行的增删和顺序变化后重新建立
+        self._positions: Optional[Dict[int, int]] = None
+        self.rowsInserted.connect(self._rows_inserted)
+        self.rowsRemoved.connect(self._invalidate_positions)
+        self.layoutChanged.connect(self._invalidate_positions)
+        self.modelReset.connect(self._invalidate_positions)
 
         self.refresh()
 
     def refresh(self):
-        self.setHorizontalHeaderLabels([x.text() for x in self.display_headers])
-        self.setRowCount(len(self.source.data))
-        for row_idx, row_data in enumerate(self.source.data):
-            for col_idx, header in enumerate([x for x in self.display_headers]):
-                item = QStandardItem(str(row_data.get(header.name) or ""))
-                item.setData(row_data.get(header.name), Qt.ItemDataRole.UserRole)
-                item.setData(row_idx, CustomRole)
-                self.setItem(row_idx, col_idx, item)
+        self.beginResetModel()
+        self._rows = list(range(self.source.row_count()))
+        self._order = None
+        self._filter = None
+        self._values = {}
+        self._new_rows = {}
+        self._removed_rows = {}
+        self._sort_index.reset()
+        self._sort_columns = ()
+        self.undo_stack.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def all_headers(self) -> List[TableHeader]:
+        return self.source.headers
+
+    def _invalidate_positions(self, *args):
+        self._positions = None
+
+    def _rows_inserted(self, parent: QModelIndex, first: int, last: int):
+        # 在末尾追加时(流式加载)只需要补充新的行
+        if self._positions is not None and last == len(self._rows) - 1:
+            for i in range(first, last + 1):
+                self._positions[self._rows[i]] = i
+        else:
+            self._positions = None
+
+    def row_position(self, row_id: int) -> int:
+        """行标识当前显示的行号, 被删除或者被过滤时返回 -1"""
+        if self._positions is None:
+            self._positions = {row_id: i for i, row_id in enumerate(self._rows)}
+        return self._positions.get(row_id, -1)
+
+    def key_row(self, key: Any) -> int:
+        """按主键查找当前显示的行号, 找不到时返回 -1"""
+        row_id = self.source.find_row(key)
+        if row_id is None:
+            return -1
+        return self.row_position(row_id)
+
+    def apply_update(self, key: Any, values: Mapping[str, Any]) -> bool:
+        """将服务端推送的某一行的新值写入 source, 未保存的编辑仍然保留
+
+        按主键找不到对应的行时返回 False, 不是表头中的列忽略。
+        撤销记录中的原始值已经过期, 同时清空撤销记录。
+        """
+        row_id = self.source.find_row(key)
+        if row_id is None:
+            return False
+        names = set(self.source.header_names())
+        values = {k: v for k, v in values.items() if k in names}
+        if values:
+            self.undo_stack.clear()
+        for name, value in values.items():
+            self.source.set_cell(row_id, name, value)
+            edits = self._values.get(row_id)
+            if edits is not None and name in edits:
+                # 编辑的值与新值相同时不再是变更
+                self._set_value(row_id, name, edits[name])
+            else:
+                self._sort_index.changed(row_id, name)
+        row = self.row_position(row_id)
+        if row >= 0:
+            self.dataChanged.emit(
+                self.index(row, 0), self.index(row, self.columnCount() - 1)
+            )
+        return True
+
+    def _source_value(self, row_id: int, name: str) -> Any:
+        if row_id < 0:
+            return None
+        return self.source.cell(row_id, name)
+
+    def _value(self, row_id: int, name: str) -> Any:
+        """获取当前值, 优先返回编辑过的值"""
+        values = self._values.get(row_id)
+        if values is not None and name in values:
+            return values[name]
+        return self._source_value(row_id, name)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row_id = self._rows[index.row()]
+        name = self.display_headers[index.column()].name
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.format_value(name, self._value(row_id, name))
+        if role == Qt.ItemDataRole.EditRole:
+            value = self._value(row_id, name)
+            return "" if value is None else str(value)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return self._alignment(name)
+        if role == Qt.ItemDataRole.UserRole:
+            return self._source_value(row_id, name)
+        if role == CustomRole:
+            return row_id if row_id >= 0 else None
+        return None
+
+    def setData(
+        self, index: QModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole
+    ) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        name = self.display_headers[index.column()].name
+        try:
+            value = self.parse_value(name, value)
+        except (ValueError, TypeError) as e:
+            logger.warning("无效的值 {}: {}", value, e)
+            return False
+        row_id = self._rows[index.row()]
+        if self._is_changed(name, self._value(row_id, name), value):
+            # 只记录修改前的编辑, 撤销到没有编辑时使用 source 中最新的值
+            old = self._values.get(row_id, {}).get(name, NO_EDIT)
+            self.undo_stack.push(EditCommand(self, [(row_id, name, old, value)]))
+        return True
+
+    def _apply_edits(self, edits: Sequence[Tuple[int, str, Any]]):
+        """设置多个单元格的值, 按行区间通知变化"""
+        for row_id, name, value in edits:
+            if value is NO_EDIT:
+                value = self._source_value(row_id, name)
+            self._set_value(row_id, name, value)
+        changed = {row_id for row_id, _, _ in edits}
+        rows = [x for x in map(self.row_position, changed) if x >= 0]
+        last_column = self.columnCount() - 1
+        for start, count in _row_ranges(rows):
+            self.dataChanged.emit(
+                self.index(start, 0), self.index(start + count - 1, last_column)
+            )
 
-    def header_names(self, all: bool = True) -> List[str]:
-        return [x.name for x in self.display_headers]
+    def parse_value(self, name: str, value: Any) -> Any:
+        """按列的类型解析输入的值, 无效时抛出 ValueError"""
+        parser = self._parsers.get(name)
+        return value if parser is None else parser(value)
+
+    def _is_changed(self, name: str, source_value: Any, value: Any) -> bool:
+        if source_value is None and (value is None or value == ""):
+            return False
+        parser = self._parsers.get(name)
+        if parser is not None and isinstance(source_value, str):
+            # 服务端返回的文本(ISO 时间等)按列的类型解析后再比较
+            try:
+                source_value = parser(source_value)
+            except (ValueError, TypeError):
+                pass
+        if type(source_value) is type(value) or (
+            _is_number(source_value) and _is_number(value)
+        ):
+            return source_value != value
+        # 没有类型的列中编辑的值为字符串
+        return str(source_value) != str(value)
+
+    def _set_value(self, row_id: int, name: str, value: Any):
+        """设置值并更新变更记录, 与原始值相同时清除该单元格的变更"""
+        if row_id < 0 or self._is_changed(
+            name, self._source_value(row_id, name), value
+        ):
+            self._values.setdefault(row_id, {})[name] = value
+        else:
+            values = self._values.get(row_id)
+            if values is None:
+                return
+            values.pop(name, None)
+            if not values:
+                del self._values[row_id]
+        self._sort_index.changed(row_id, name)
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return _EDITABLE_FLAGS
+
+    def insertRows(
+        self, row: int, count: int, parent: QModelIndex = QModelIndex()
+    ) -> bool:
+        if parent.isValid() or count <= 0 or not 0 <= row <= len(self._rows):
+            return False
+        self.insert_new_rows(row, [{}] * count)
+        return True
+
+    def insert_new_rows(self, row: int, rows: Sequence[Mapping[str, Any]]):
+        """在第row行之前插入多个新增的行, 只发出一次插入信号"""
+        count = len(rows)
+        if count <= 0 or not 0 <= row <= len(self._rows):
+            return
+        new_rows = list(range(self._next_new_row, self._next_new_row - count, -1))
+        self._next_new_row -= count
+        at = row
+        if self._order is not None:
+            at = (
+                self._order.index(self._rows[row])
+                if row < len(self._rows)
+                else len(self._order)
+            )
+        values = {row_id: dict(x) for row_id, x in zip(new_rows, rows) if x}
+        self.undo_stack.push(
+            InsertRowsCommand(self, list(enumerate(new_rows, at)), values)
+        )
 
-    def header_labels(self, _all: bool = True) -> List[str]:
-        return [x.text() for x in self.display_headers]
+    def removeRows(
+        self, row: int, count: int, parent: QModelIndex = QModelIndex()
+    ) -> bool:
+        if parent.isValid() or count <= 0 or row < 0 or row + count > len(self._rows):
+            return False
+        self.remove_rows(range(row, row + count))
+        return True
+
+    def remove_rows(self, rows: Iterable[int]):
+        """删除多行, 连续的行合并为一次删除, 删除的 source 行记录在 _removed_rows"""
+        removed = {self._rows[x] for x in rows if 0 <= x < len(self._rows)}
+        if not removed:
+            return
+        entries = [(i, x) for i, x in enumerate(self._all_rows()) if x in removed]
+        self.undo_stack.push(RemoveRowsCommand(self, entries))
+
+    def _take_rows(self, row_ids: Set[int]) -> Dict[int, Dict[str, Any]]:
+        """移除行, 返回这些行中未保存的编辑"""
+        rows = [i for i, x in enumerate(self._rows) if x in row_ids]
+        for start, count in reversed(_row_ranges(rows)):
+            self.beginRemoveRows(QModelIndex(), start, start + count - 1)
+            del self._rows[start : start + count]
+            self.endRemoveRows()
+        values = {}
+        for row_id in row_ids:
+            if row_id in self._values:
+                values[row_id] = self._values.pop(row_id)
+            if row_id < 0:
+                self._new_rows.pop(row_id, None)
+            else:
+                self._removed_rows[row_id] = None
+        if self._order is not None and self._filter is not None:
+            self._order = [x for x in self._order if x not in row_ids]
+            self._filter.difference_update(row_ids)
+        self._sort_index.rows_changed()
+        return values
+
+    def _restore_rows(
+        self, entries: List[Tuple[int, int]], values: Dict[int, Dict[str, Any]]
+    ):
+        """将行放回 entries 记录的位置 [(在全部行中的位置, 行标识)], 并恢复未保存的编辑"""
+        current = iter(self._all_rows())
+        order: List[int] = []
+        for at, row_id in sorted(entries):
+            order.extend(itertools.islice(current, max(at - len(order), 0)))
+            order.append(row_id)
+            if row_id < 0:
+                self._new_rows[row_id] = None
+            else:
+                self._removed_rows.pop(row_id, None)
+        order.extend(current)
+        self._values.update(values)
+        self._sort_index.rows_changed()
+        if self._order is not None and self._filter is not None:
+            self._filter.update(x for _, x in entries)
+            self._order = order
+            order = [x for x in order if x in self._filter]
+        self._apply_rows(order)
+
+    def sort(
+        self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder
+    ) -> None:
+        """点击表头排序, 按住 Shift 点击时作为次要排序列"""
+        if not 0 <= column < len(self.display_headers):
+            return
+        name = self.display_headers[column].name
+        desc = order == Qt.SortOrder.DescendingOrder
+        if QGuiApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier:
+            columns = [x for x in self._sort_columns if x[0] != name]
+            columns.append((name, desc))
+        else:
+            columns = [(name, desc)]
+        self.sort_by(columns)
+
+    def sort_by(self, columns: Sequence[Tuple[str, bool]]):
+        """按多列排序, columns 为 [(列名, 是否降序), ...], 只调整行的映射"""
+        self._sort_columns = tuple(columns)
+        if not self._sort_columns:
+            return
+        rows = self._sort_index.sort(self._all_rows(), self._sort_columns)
+        if self._order is not None and self._filter is not None:
+            self._order = rows
+            rows = [x for x in rows if x in self._filter]
+        self._relayout(rows)
+
+    def append_rows(self, rows: Sequence[Mapping[str, Any]]):
+        """在 source 末尾追加行并显示, 用于流式加载, 每次只发出一次插入信号
+
+        快速过滤时追加的行在重新过滤之前不显示, 已排序时合并到排序后的位置。
+        """
+        if not rows:
+            return
+        start = self.source.row_count()
+        self.source.extend(rows)
+        row_ids = list(range(start, start + len(rows)))
+        self._sort_index.rows_changed()
+        if self._order is not None:
+            if self._sort_columns:
+                self._order = self._sort_index.merge(
+                    self._order, row_ids, self._sort_columns
+                )
+            else:
+                self._order.extend(row_ids)
+            return
+        merged = None
+        if self._sort_columns:
+            merged = self._sort_index.merge(self._rows, row_ids, self._sort_columns)
+        self.beginInsertRows(
+            QModelIndex(), len(self._rows), len(self._rows) + len(row_ids) - 1
+        )
+        self._rows.extend(row_ids)
+        self.endInsertRows()
+        if merged is not None:
+            self._relayout(merged)
+
+    def values(self, names: Sequence[str]) -> Iterator[List[Any]]:
+        """当前显示的每一行中指定列的值, 包括未保存的编辑"""
+        for row_id in self._rows:
+            yield [self._value(row_id, name) for name in names]
+
+    def _all_rows(self) -> List[int]:
+        """全部的行标识, 包括被快速过滤隐藏的行"""
+        return self._rows if self._order is None else self._order
+
+    def set_row_filter(self, rows: Optional[Set[int]]):
+        """只显示指定的行, None 表示显示全部的行; 只修改行的映射, 不复制数据"""
+        if rows is None:
+            if self._order is None:
+                return
+            order, self._order, self._filter = self._order, None, None
+            self._apply_rows(order)
+            return
+        if self._order is None:
+            self._order = list(self._rows)
+        self._filter = rows
+        self._apply_rows([x for x in self._order if x in rows])
+
+    def filter_rows(self, index: SearchIndex, query: str):
+        """快速过滤, 索引中查找 source 中匹配的行, 编辑过和新增的行按当前值匹配"""
+        if not query:
+            self.set_row_filter(None)
+            return
+        rows = index.search(query)
+        for row_id in [*self._values, *self._new_rows]:
+            if index.match(
+                [
+                    self.format_value(x.name, self._value(row_id, x.name))
+                    for x in self.source.headers
+                ],
+                query,
+            ):
+                rows.add(row_id)
+            else:
+                rows.discard(row_id)
+        self.set_row_filter(rows)
+
+    def _apply_rows(self, rows: List[int]):
+        """切换到新的行列表, 只对删除和新增的行发出信号, 已有行的顺序变化时调整布局"""
+        target = set(rows)
+        gone = [i for i, x in enumerate(self._rows) if x not in target]
+        for start, count in reversed(_row_ranges(gone)):
+            self.beginRemoveRows(QModelIndex(), start, start + count - 1)
+            del self._rows[start : start + count]
+            self.endRemoveRows()
+
+        current = set(self._rows)
+        survivors = [x for x in rows if x in current]
+        if survivors != self._rows:
+            self._relayout(survivors)
+
+        groups: List[Tuple[int, List[int]]] = []
+        for i, row_id in enumerate(rows):
+            if row_id in current:
+                continue
+            if groups and groups[-1][0] + len(groups[-1][1]) == i:
+                groups[-1][1].append(row_id)
+            else:
+                groups.append((i, [row_id]))
+        for start, row_ids in groups:
+            self.beginInsertRows(QModelIndex(), start, start + len(row_ids) - 1)
+            self._rows[start:start] = row_ids
+            self.endInsertRows()
+
+    def _relayout(self, rows: List[int]):
+        """调整行顺序, 并同步更新视图中的持久索引(选中行、当前行等)"""
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        old_rows = [(self._rows[x.row()], x.column()) for x in old_indexes]
+        self._rows = rows
+        if old_indexes:
+            position = {row_id: i for i, row_id in enumerate(rows)}
+            self.changePersistentIndexList(
+                old_indexes,
+                [
+                    (
+                        self.index(position[row_id], col)
+                        if row_id in position
+                        else QModelIndex()
+                    )
+                    for row_id, col in old_rows
+                ],
+            )
+        self.layoutChanged.emit()
+
+    def _source_row_changed(self, source: DataTable, old: int, new: int) -> bool:
+        if not self.source.is_columnar() and not source.is_columnar():
+            return self.source.data[old] != source.data[new]
+        return any(
+            self.source.cell(old, x.name) != source.cell(new, x.name)
+            for x in source.headers
+        )
+
+    def can_reconcile(self, source: DataTable) -> bool:
+        """source 是否可以按主键合并到当前模型: 主键和列都一致"""
+        key = source.primary_key()
+        return (
+            bool(key)
+            and key == self.source.primary_key()
+            and source.header_names() == self.source.header_names()
+        )
+
+    def reconcile(self, source: DataTable) -> bool:
+        """根据主键将刷新后的数据合并到当前模型
+
+        只对新增、删除和变化的行发出对应的信号, 保留选中行、滚动位置和未保存的编辑。
+        没有主键或者列不一致时返回 False, 由调用方重新创建模型。
+        """
+        if not self.can_reconcile(source):
+            return False
+        key = source.primary_key()
+        new_keys = source.column(key)
+        new_index = {k: i for i, k in enumerate(new_keys)}
+        if len(new_index) != len(new_keys):
+            logger.warning("主键 {} 存在重复值, 无法合并", key)
+            return False
+
+        # 旧行号 -> 新行号
+        remap: Dict[int, int] = {}
+        for i, k in enumerate(self.source.column(key)):
+            j = new_index.get(k)
+            if j is not None:
+                remap[i] = j
+        changed = {
+            j for i, j in remap.items() if self._source_row_changed(source, i, j)
+        }
+        self._remap_history(remap)
+
+        # 删除已经不存在的行
+        self._apply_rows([x for x in self._rows if x < 0 or x in remap])
+
+        # 行标识切换到新数据
+        order = [
+            remap[x] if x >= 0 else x for x in self._all_rows() if x < 0 or x in remap
+        ]
+        self._rows = [remap[x] if x >= 0 else x for x in self._rows]
+        self._positions = None
+        if self._filter is not None:
+            self._filter = {
+                remap[x] if x >= 0 else x for x in self._filter if x < 0 or x in remap
+            }
+        self._values = {
+            (remap[k] if k >= 0 else k): v
+            for k, v in self._values.items()
+            if k < 0 or k in remap
+        }
+        self._removed_rows = {remap[x]: None for x in self._removed_rows if x in remap}
+        headers = {x.name: x for x in source.headers}
+        self.display_headers = [headers[x.name] for x in self.display_headers]
+        self.set_formatters(source.headers)
+        self.source = source
+        self._sort_index.reset()
+        for row_id in [x for x in self._values if x >= 0]:
+            for name, value in list(self._values[row_id].items()):
+                self._set_value(row_id, name, value)
+
+        # 新增的行
+        kept = set(remap.values())
+        arrived = [j for j in range(source.row_count()) if j not in kept]
+        if self._sort_columns:
+            order = self._sort_index.sort(order + arrived, self._sort_columns)
+        else:
+            # 已有的行按服务端的顺序排列, 本地新增的行保持原来的位置
+            ordered = iter(sorted([x for x in order if x >= 0] + arrived))
+            order = [next(ordered) if x >= 0 else x for x in order]
+            order.extend(ordered)
+        if self._order is not None and self._filter is not None:
+            # 快速过滤时新增的行在重新过滤之前不显示
+            self._order = order
+            order = [x for x in order if x in self._filter]
+        self._apply_rows(order)
+
+        # 通知变化的行
+        if changed:
+            last_column = self.columnCount() - 1
+            rows = [i for i, row_id in enumerate(self._rows) if row_id in changed]
+            for start, count in _row_ranges(rows):
+                self.dataChanged.emit(
+                    self.index(start, 0), self.index(start + count - 1, last_column)
+                )
+        return True
+
+    def _remap_history(self, remap: Mapping[int, int]):
+        """刷新后更新撤销记录中的行标识, 记录中的行已经不存在时清空撤销记录"""
+        stack = self.undo_stack
+        for i in range(stack.count()):
+            command = stack.command(i)
+            if not command.remap(remap):
+                logger.debug("刷新后撤销记录中的行已经不存在, 清空撤销记录")
+                stack.clear()
+                return
 
     def _row_data(self, n: int) -> Mapping[str, Any]:
         """获取第n行数据, 转化为dict"""
-        if 0 <= n < self.rowCount():
-            return self.source.data[n]
+        if 0 <= n < self.rowCount() and self._rows[n] >= 0:
+            return self.source.row(self._rows[n])
         return {}
 
-    def compare(self):
-        """比较变更"""
-
-        def _compare_row(n: int) -> Dict:
-            different_data = {}
-            for col in range(self.columnCount()):
-                user_data = self.index(n, col).data(role=Qt.ItemDataRole.UserRole)
-                display_data = self.index(n, col).data(role=Qt.ItemDataRole.DisplayRole)
-                if user_data is None and not display_data:
-                    continue
-                if str(user_data) != str(display_data):
-                    different_data[self.source.headers[col].name] = display_data
-
-            return different_data
-
-        def _edited_data(row: int) -> Mapping[str, str]:
-            return {
-                self.display_headers[x]
-                .name: self.index(row, x)
-                .data(role=Qt.ItemDataRole.DisplayRole)
-                for x in range(self.columnCount())
-                if self.index(row, x).data(role=Qt.ItemDataRole.DisplayRole) is not None
-            }
+    def _source_row(self, row_id: int) -> Dict[str, Any]:
+        """复制 source 中的一行, 包括值为 None 的列"""
+        row: Dict[str, Any] = {x.name: None for x in self.source.headers}
+        row.update(self.source.row(row_id))
+        return row
 
+    def changes(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """变更记录, 每一项为 (行标识, compare 中对应的变更)"""
         changes = []
-        exists_row = set([])
-        for row in range(self.rowCount()):
-            setted_row: Optional[int] = self.index(row, 0).data(role=CustomRole)
-            if setted_row is None:
-                # index_row 为空，则认为是新增
-
-                changes.append({"source": None, "change": _edited_data(row)})
-                continue
-            exists_row.add(setted_row)
-            changed_data = _compare_row(row)
-            if changed_data:
+        for row_id, values in self._values.items():
+            if row_id >= 0:
                 changes.append(
-                    {"source": self.source.data[setted_row], "change": changed_data}
+                    (
+                        row_id,
+                        {"source": self._source_row(row_id), "change": dict(values)},
+                    )
                 )
+        for row_id in self._new_rows:
+            changes.append(
+                (
+                    row_id,
+                    {
+                        "source": None,
+                        "change": {
+                            name: value
+                            for name, value in self._values.get(row_id, {}).items()
+                            if value is not None
+                        },
+                    },
+                )
+            )
+        for row_id in self._removed_rows:
+            changes.append(
+                (row_id, {"source": self._source_row(row_id), "change": None})
+            )
+        return changes
+
+    def compare(self):
+        """比较变更, 只遍历变更记录"""
+        return [change for _, change in self.changes()]
+
+    def commit(self, changes: Sequence[Tuple[int, Dict[str, Any]]]):
+        """将已经保存的变更写入 source, 这些行不再视为变更
+
+        changes 为 changes() 返回的项, 保存期间再次编辑的值仍然作为变更保留。
+        已经保存的操作不能再撤销, 同时清空撤销记录。
+        """
+        self.undo_stack.clear()
+        new_ids: Dict[int, int] = {}
+        for row_id, change in changes:
+            values = change["change"]
+            if values is None:
+                self._removed_rows.pop(row_id, None)
+            elif row_id >= 0:
+                for name, value in values.items():
+                    self.source.set_cell(row_id, name, value)
+            elif row_id in self._new_rows:
+                # 新增的行保存后成为 source 的行
+                del self._new_rows[row_id]
+                new_ids[row_id] = self.source.row_count()
+                self.source.extend([dict(values)])
+        if new_ids:
+            self._rows = [new_ids.get(x, x) for x in self._rows]
+            self._positions = None
+            if self._order is not None:
+                self._order = [new_ids.get(x, x) for x in self._order]
+            if self._filter is not None:
+                self._filter = {new_ids.get(x, x) for x in self._filter}
+            self._values = {new_ids.get(k, k): v for k, v in self._values.items()}
+            self._sort_index.rows_changed()
+        for row_id, _ in changes:
+            row_id = new_ids.get(row_id, row_id)
+            for name, value in list(self._values.get(row_id, {}).items()):
+                self._set_value(row_id, name, value)
+        if new_ids:
+            saved = set(new_ids.values())
+            last_column = self.columnCount() - 1
+            rows = [i for i, row_id in enumerate(self._rows) if row_id in saved]
+            for start, count in _row_ranges(rows):
+                self.dataChanged.emit(
+                    self.index(start, 0), self.index(start + count - 1, last_column)
+                )
+
+
+class ScrollDataModel(ColumnModel):
+    """无限滚动模式的只读数据模型
+
+    func_fetch 返回的每一页作为一个数据块, 视图滚动到最后一个数据块时在后台加载下一页。
+    已加载的数据块最多保留 max_blocks 个, 超出时淘汰距离当前位置最远的数据块,
+    被淘汰的数据块再次显示时重新加载。
+    """
+
+    def __init__(self, func_fetch: FetchFunc, max_blocks: int = 10):
+        super().__init__()
+        self.func_fetch = func_fetch
+        self.max_blocks = max(max_blocks, 2)
+        self._generation = 0
+        self.reset()
+
+    def reset(self):
+        """清空已加载的数据, 重新从第一页开始加载"""
+        self.beginResetModel()
+        # 使还在加载中的请求失效
+        self._generation += 1
+        self.headers: List[TableHeader] = []
+        self.display_headers = []
+        self.max_page = 1
+        # 已加载过的每一页的行数和起始行
+        self._sizes: List[int] = []
+        self._offsets: List[int] = []
+        self._blocks: OrderedDict[int, DataTable] = OrderedDict()
+        self._loading: Set[int] = set()
+        self._current_page = 1
+        self.endResetModel()
+
+    def all_headers(self) -> List[TableHeader]:
+        return self.headers
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid() or not self._sizes:
+            return 0
+        return self._offsets[-1] + self._sizes[-1]
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        page = len(self._sizes) + 1
+        return page <= self.max_page and page not in self._loading
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        if self.canFetchMore(parent):
+            self._load(len(self._sizes) + 1)
+
+    def _load(self, page: int):
+        self._loading.add(page)
+        # 流式结果合并为完整的一页后作为一个数据块
+        DataTableThread(self, fetch_page, self.func_fetch, page).with_priority(
+            PRIORITY_HIGH
+        ).on_success(partial(self._loaded, self._generation, page)).on_exception(
+            partial(self._load_failed, self._generation, page)
+        ).start()
+
+    def _load_failed(self, generation: int, page: int, e: Exception):
+        if generation != self._generation:
+            return
+        self._loading.discard(page)
+        logger.error("加载第 {} 页失败: {}", page, e)
+
+    def _loaded(self, generation: int, page: int, dt: DataTable):
+        if generation != self._generation:
+            return
+        self._loading.discard(page)
+        if page <= len(self._sizes):
+            # 被淘汰后重新加载的数据块
+            self._store(page, dt)
+            start, size = self._offsets[page - 1], self._sizes[page - 1]
+            if size:
+                self.dataChanged.emit(
+                    self.index(start, 0),
+                    self.index(start + size - 1, self.columnCount() - 1),
+                )
+            return
+
+        size = dt.row_count()
+        # 返回空页时认为已经没有更多数据
+        self.max_page = dt.max_page if size else page - 1
+        if not self._sizes:
+            self.beginResetModel()
+            self.headers = list(dt.headers)
+            self.display_headers = list(dt.headers)
+            self.set_formatters(dt.headers)
+            self._append(page, dt)
+            self.endResetModel()
+            return
+        if not size:
+            return
+        start = self.rowCount()
+        self.beginInsertRows(QModelIndex(), start, start + size - 1)
+        self._append(page, dt)
+        self.endInsertRows()
+
+    def _append(self, page: int, dt: DataTable):
+        self._offsets.append(self.rowCount())
+        self._sizes.append(dt.row_count())
+        self._store(page, dt)
+
+    def _store(self, page: int, dt: DataTable):
+        self._blocks[page] = dt
+        self._blocks.move_to_end(page)
+        while len(self._blocks) > self.max_blocks:
+            current = self._current_page
+            del self._blocks[max(self._blocks, key=lambda x: abs(x - current))]
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        name = self.display_headers[index.column()].name
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return self._alignment(name)
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        row = index.row()
+        page = bisect_right(self._offsets, row)
+        self._current_page = page
+        if page == len(self._sizes) and self.canFetchMore():
+            # 显示到最后一个数据块时提前加载下一页
+            self.fetchMore()
+        block = self._blocks.get(page)
+        if block is None:
+            if page not in self._loading:
+                self._load(page)
+            return None
+        self._blocks.move_to_end(page)
+        n = row - self._offsets[page - 1]
+        if n >= block.row_count():
+            return None
+        return self.format_value(name, block.cell(n, name))
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return _READONLY_FLAGS
+
+
+class CellDelegate(QStyledItemDelegate):
+    """直接绘制格式化后的文本
+
+    每个单元格只读取显示文本和对齐方式, 省略后的文本按 (文本, 宽度, 字体) 缓存最多 cache_size 个。
+    """
+
+    def __init__(self, parent: Optional[QObject] = None, cache_size: int = 4096):
+        super().__init__(parent)
+        self.cache_size = cache_size
+        self._elided: OrderedDict[Tuple[str, int, str], str] = OrderedDict()
+
+    def _elide(self, option: QStyleOptionViewItem, text: str, width: int) -> str:
+        key = (text, width, option.font.key())
+        elided = self._elided.get(key)
+        if elided is not None:
+            self._elided.move_to_end(key)
+            return elided
+        elided = option.fontMetrics.elidedText(text, Qt.TextElideMode.ElideRight, width)
+        self._elided[key] = elided
+        if len(self._elided) > self.cache_size:
+            self._elided.popitem(last=False)
+        return elided
+
+    def paint(
+        self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex
+    ) -> None:
+        widget = option.widget
+        style = widget.style() if widget else QApplication.style()
+        # 背景, 包括选中和交替行的颜色
+        style.drawPrimitive(
+            QStyle.PrimitiveElement.PE_PanelItemViewItem, option, painter, widget
+        )
+        text = index.data(Qt.ItemDataRole.DisplayRole)
+        if text:
+            margin = style.pixelMetric(QStyle.PixelMetric.PM_FocusFrameHMargin) + 1
+            rect = option.rect.adjusted(margin, 0, -margin, 0)
+            selected = option.state & QStyle.StateFlag.State_Selected
+            painter.save()
+            painter.setFont(option.font)
+            painter.setPen(
+                option.palette.color(
+                    QPalette.ColorRole.HighlightedText
+                    if selected
+                    else QPalette.ColorRole.Text
+                )
+            )
+            alignment = index.data(Qt.ItemDataRole.TextAlignmentRole)
+            painter.drawText(
+                rect,
+                int(alignment or Qt.AlignmentFlag.AlignVCenter),
+                self._elide(option, str(text), rect.width()),
+            )
+            painter.restore()
+        if option.state & QStyle.StateFlag.State_HasFocus:
+            focus = QStyleOptionFocusRect()
+            focus.rect = option.rect
+            focus.state = option.state
+            focus.palette = option.palette
+            style.drawPrimitive(
+                QStyle.PrimitiveElement.PE_FrameFocusRect, focus, painter, widget
+            )
+
+
+class PinnedHeaderView(QHeaderView):
+    """水平表头, 前 pinned 列固定在左侧, 不随水平滚动"""
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(Qt.Orientation.Horizontal, parent)
+        self.setSectionsClickable(True)
+        self.setHighlightSections(True)
+        self.pinned = 0
+        # 在固定列上按下鼠标时, 直到松开之前的事件都映射到固定列
+        self._pinned_press = False
+
+    def pinned_width(self) -> int:
+        return sum(
+            self.sectionSize(i)
+            for i in range(min(self.pinned, self.count()))
+            if not self.isSectionHidden(i)
+        )
+
+    def paintEvent(self, e) -> None:
+        super().paintEvent(e)
+        if not self.pinned or not self.offset():
+            return
+        painter = QPainter(self.viewport())
+        for i in range(min(self.pinned, self.count())):
+            if self.isSectionHidden(i):
                 continue
+            painter.save()
+            self.paintSection(
+                painter,
+                QRect(self.sectionPosition(i), 0, self.sectionSize(i), self.height()),
+                i,
+            )
+            painter.restore()
+
+    def _map_event(self, e: QMouseEvent, pinned: bool) -> QMouseEvent:
+        """固定列显示的位置转换为实际的位置"""
+        if not pinned or not self.offset():
+            return e
+        return QMouseEvent(
+            e.type(),
+            e.position() - QPointF(self.offset(), 0),
+            e.globalPosition(),
+            e.button(),
+            e.buttons(),
+            e.modifiers(),
+        )
 
-        # 最后计算删除的行
-        for source_row in [
-            x for i, x in enumerate(self.source.data) if i not in exists_row
-        ]:
-            changes.append({"source": source_row, "change": None})
-        return changes
+    def _in_pinned(self, e: QMouseEvent) -> bool:
+        return self.pinned > 0 and e.position().x() < self.pinned_width()
 
-    def column_index(self, name: str):
-        for i, header in enumerate(self.source.headers):
-            print(i, header.label, name)
-            if header.name == name or header.label == name:
-                return i
-        return -1
+    def mousePressEvent(self, e: QMouseEvent) -> None:
+        self._pinned_press = self._in_pinned(e)
+        super().mousePressEvent(self._map_event(e, self._pinned_press))
+
+    def mouseMoveEvent(self, e: QMouseEvent) -> None:
+        pinned = self._pinned_press if e.buttons() else self._in_pinned(e)
+        super().mouseMoveEvent(self._map_event(e, pinned))
+
+    def mouseReleaseEvent(self, e: QMouseEvent) -> None:
+        super().mouseReleaseEvent(self._map_event(e, self._pinned_press))
+        self._pinned_press = False
+
+    def mouseDoubleClickEvent(self, e: QMouseEvent) -> None:
+        super().mouseDoubleClickEvent(self._map_event(e, self._in_pinned(e)))
 
 
 class TableView(QTableView):
-    """自定义数据表视图"""
+    """自定义数据表视图
+
+    冻结列由同一个视图绘制: 水平滚动后在左侧重新绘制前 frozen_columns 列,
+    indexAt/visualRect 按固定的位置计算, 共用模型、选择和滚动状态。
+    """
 
-    def __init__(self, resize_mode=QHeaderView.ResizeMode.ResizeToContents):
+    def __init__(self, resize_mode=QHeaderView.ResizeMode.Interactive):
         super().__init__()
         self.resize_mode = resize_mode
-        self.frozen_tableview = QTableView(self)
-
-        self.setup_frozen_tableview()
-
-        self._syncing_selection = False
+        self.setHorizontalHeader(PinnedHeaderView(self))
+        self.setItemDelegate(CellDelegate(self))
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        # Interactive 模式下抽样估算列宽, 其他模式由 QHeaderView 处理
+        self.column_widths: Optional[ColumnWidths] = None
+        if resize_mode == QHeaderView.ResizeMode.Interactive:
+            self.column_widths = ColumnWidths(self)
 
         # 基本高亮设置
         # 整行选择
@@ -150,52 +1260,11 @@ class TableView(QTableView):
         )  # 白色文字
         self.frozen_columns = 0
 
-        # 同步两个视图
-        vsb = self.verticalScrollBar()
-        frozen_vsb = self.frozen_tableview.verticalScrollBar()
-        if vsb and frozen_vsb:
-            vsb.valueChanged.connect(frozen_vsb.setValue)
-            frozen_vsb.valueChanged.connect(vsb.setValue)
-
-    def setup_frozen_tableview(self):
-        """设置冻结表格"""
-        self.frozen_tableview.setFocusPolicy(Qt.FocusPolicy.NoFocus)
-        f_v_header = self.frozen_tableview.verticalHeader()
-        f_h_header = self.frozen_tableview.horizontalHeader()
-        if f_v_header is not None:
-            f_v_header.hide()
-        if f_h_header is not None:
-            f_h_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
-        # 设置冻结表格的滚动条策略
-        self.frozen_tableview.setHorizontalScrollBarPolicy(
-            Qt.ScrollBarPolicy.ScrollBarAlwaysOff
-        )  # 隐藏水平滚动条
-        self.frozen_tableview.setVerticalScrollBarPolicy(
-            Qt.ScrollBarPolicy.ScrollBarAlwaysOff
-        )  # 隐藏垂直滚动条
-        vsb = self.frozen_tableview.verticalScrollBar()
-        if vsb is not None:
-            vsb.valueChanged.connect(vsb.setValue)
-        # 设置无边框
-        self.frozen_tableview.setFrameShape(QFrame.Shape.NoFrame)
-        self.frozen_tableview.setStyleSheet(
-            """
-            QTableView {
-                border: none;  /* 确保无边框 */
-                outline: none; /* 移除焦点边框 */
-                color: orange;
-            }
-            
-            QTableView::item:selected {
-                background-color: #0078d4;
-            }
-        """
-        )
-
-        vp = self.viewport()
-
-        if vp:
-            vp.stackUnder(self.frozen_tableview)
+        # 点击表头排序, 初始不排序
+        header = self.horizontalHeader()
+        if header:
+            header.setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.setSortingEnabled(True)
 
     def set_model(self, model: DataModel):
         """设置模型"""
@@ -203,132 +1272,169 @@ class TableView(QTableView):
         header = self.horizontalHeader()
         if header:
             header.setSectionResizeMode(self.resize_mode)
+            header.setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        if self.column_widths:
+            self.column_widths.set_model(model)
+        self.set_frozen_columns(self.frozen_columns)
+
+    def set_frozen_columns(self, count: int):
+        """冻结前count列"""
+        self.frozen_columns = count
+        header = self.horizontalHeader()
+        if isinstance(header, PinnedHeaderView):
+            header.pinned = count
+            header.viewport().update()
+        self.viewport().update()
 
-        frozen_header = self.frozen_tableview.horizontalHeader()
-        if frozen_header:
-            frozen_header.setSectionResizeMode(self.resize_mode)
-
-        self.frozen_tableview.setModel(model)
-        self.update_frozen_tableview_geometry()
-
-        # 只显示前几列
-        if model:
-            for col in range(model.columnCount()):
-                self.frozen_tableview.setColumnHidden(col, col >= self.frozen_columns)
-        # 同步列宽
-        for col in range(self.frozen_columns):
-            self.frozen_tableview.setColumnWidth(col, self.columnWidth(col))
-        # 连接选择信号
-        self.connect_selection_signals()
-
-    def connect_selection_signals(self):
-        """连接选择变化信号"""
-        sm = self.selectionModel()
-        if sm:
-            sm.selectionChanged.connect(self.on_main_selection_changed)
-        frozen_sm = self.frozen_tableview.selectionModel()
-        if frozen_sm:
-            frozen_sm.selectionChanged.connect(self.on_frozen_selection_changed)
-
-    def on_main_selection_changed(
-        self, selected: QItemSelection, deselected: QItemSelection
-    ):
-        """主表格选择变化时的处理"""
-        if self._syncing_selection:
+    def _pinned_width(self) -> int:
+        header = self.horizontalHeader()
+        if not self.frozen_columns or not isinstance(header, PinnedHeaderView):
+            return 0
+        return header.pinned_width()
+
+    def indexAt(self, pos: QPoint) -> QModelIndex:
+        if 0 <= pos.x() < self._pinned_width():
+            pos = QPoint(pos.x() - self.horizontalOffset(), pos.y())
+        return super().indexAt(pos)
+
+    def visualRect(self, index: QModelIndex) -> QRect:
+        rect = super().visualRect(index)
+        if index.isValid() and index.column() < self.frozen_columns:
+            rect.translate(self.horizontalOffset(), 0)
+        return rect
+
+    def scrollContentsBy(self, dx: int, dy: int) -> None:
+        super().scrollContentsBy(dx, dy)
+        if dx and self.frozen_columns:
+            # 固定列不随水平滚动, 整体重绘
+            self.viewport().update()
+            self.horizontalHeader().viewport().update()
+
+    def selectionChanged(self, selected, deselected) -> None:
+        super().selectionChanged(selected, deselected)
+        width = self._pinned_width()
+        if width and self.horizontalOffset():
+            self.viewport().update(QRect(0, 0, width, self.viewport().height()))
+
+    def paintEvent(self, e) -> None:
+        super().paintEvent(e)
+        width = self._pinned_width()
+        if not width:
             return
-
-        self._syncing_selection = True
-
-        # 获取当前选择
-        sm = self.selectionModel()
-        frozen_sm = self.frozen_tableview.selectionModel()
-        if sm:
-            selected_indexes = sm.selectedIndexes()
-
-            if selected_indexes and frozen_sm:
-                # 取消冻结表格的所有选择
-                frozen_sm.clearSelection()
-
-                # 检查是否选择了冻结列
-                has_frozen_selection = any(
-                    index.column() < self.frozen_columns for index in selected_indexes
-                )
-
-                if has_frozen_selection:
-                    # 如果选择了冻结列，在冻结表格中也选择
-                    for index in selected_indexes:
-                        if index.column() < self.frozen_columns:
-                            frozen_sm.select(
-                                index, QItemSelectionModel.SelectionFlag.Select
-                            )
-
-        self._syncing_selection = False
-
-    def on_frozen_selection_changed(self, selected, deselected):
-        """冻结表格选择变化时的处理"""
-        if self._syncing_selection:
+        painter = QPainter(self.viewport())
+        if self.horizontalOffset():
+            self._paint_pinned(painter, width)
+        # 固定列的分隔线
+        painter.setPen(self.palette().color(QPalette.ColorRole.Mid))
+        painter.drawLine(width - 1, 0, width - 1, self.viewport().height())
+
+    def _paint_pinned(self, painter: QPainter, width: int):
+        """在左侧绘制固定列"""
+        model = self.model()
+        viewport = self.viewport()
+        if model is None or viewport is None:
             return
-
-        self._syncing_selection = True
-        # 获取冻结表格的选择
-        sm = self.selectionModel()
-        f_sm = self.frozen_tableview.selectionModel()
-        if f_sm:
-            frozen_selected = f_sm.selectedIndexes()
-            if frozen_selected and sm:
-                # 取消主表格的所有选择
-                sm.clearSelection()
-        self._syncing_selection = False
-
-    def update_frozen_tableview_geometry(self):
-        """更新冻结表格的几何形状"""
-        if not self.model():
+        first = self.rowAt(0)
+        if first < 0:
             return
+        last = self.rowAt(viewport.height() - 1)
+        if last < 0:
+            last = model.rowCount() - 1
+        painter.fillRect(QRect(0, 0, width, viewport.height()), self.palette().base())
 
-        total_width = 0
-        for col in range(self.frozen_columns):
-            total_width += self.columnWidth(col)
-
-        v_header = self.verticalHeader()
-        h_header = self.horizontalHeader()
-        viewport = self.viewport()
-        if v_header and h_header and viewport:
-            self.frozen_tableview.setGeometry(
-                v_header.width() + self.frameWidth(),
-                self.frameWidth(),
-                total_width,
-                viewport.height() + h_header.height(),
+        header = self.horizontalHeader()
+        option = QStyleOptionViewItem()
+        self.initViewItemOption(option)
+        grid = 1 if self.showGrid() else 0
+        grid_color = QColor.fromRgba(
+            self.style().styleHint(
+                QStyle.StyleHint.SH_Table_GridLineColor, option, self
             )
-
-    def resizeEvent(self, e):
-        """重写 resize 事件"""
-        super().resizeEvent(e)
-        self.update_frozen_tableview_geometry()
-
-        # 同步垂直滚动
-        self.frozen_tableview.setVerticalScrollMode(self.verticalScrollMode())
-
-    def scrollTo(self, index, hint=QAbstractItemView.ScrollHint):
-        """重写滚动事件"""
-        if index.column() >= self.frozen_columns:
+            & 0xFFFFFFFF
+        )
+        sm = self.selectionModel()
+        current = self.currentIndex()
+        for row in range(first, last + 1):
+            if self.isRowHidden(row):
+                continue
+            y = self.rowViewportPosition(row)
+            height = self.rowHeight(row)
+            for col in range(self.frozen_columns):
+                if self.isColumnHidden(col):
+                    continue
+                index = model.index(row, col)
+                x = header.sectionPosition(col)
+                cell = QStyleOptionViewItem(option)
+                cell.rect = QRect(x, y, header.sectionSize(col) - grid, height - grid)
+                if sm and sm.isSelected(index):
+                    cell.state |= QStyle.StateFlag.State_Selected
+                if index == current and self.hasFocus():
+                    cell.state |= QStyle.StateFlag.State_HasFocus
+                if self.alternatingRowColors() and row % 2:
+                    cell.features |= QStyleOptionViewItem.ViewItemFeature.Alternate
+                self.itemDelegateForIndex(index).paint(painter, cell, index)
+                if grid:
+                    painter.setPen(grid_color)
+                    right = cell.rect.right() + 1
+                    bottom = cell.rect.bottom() + 1
+                    painter.drawLine(right, y, right, bottom)
+                    painter.drawLine(x, bottom, right, bottom)
+
+    def scrollTo(
+        self,
+        index: QModelIndex,
+        hint: QAbstractItemView.ScrollHint = QAbstractItemView.ScrollHint.EnsureVisible,
+    ):
+        """滚动到 index, 固定列只在垂直方向滚动, 其他列不被固定列遮挡"""
+        if not index.isValid() or not self.frozen_columns:
             super().scrollTo(index, hint)
+            return
+        hsb = self.horizontalScrollBar()
+        if hsb is None:
+            super().scrollTo(index, hint)
+            return
+        if index.column() < self.frozen_columns:
+            value = hsb.value()
+            super().scrollTo(index, hint)
+            hsb.setValue(value)
+            return
+        super().scrollTo(index, hint)
+        covered = self._pinned_width() - super().visualRect(index).left()
+        if covered > 0:
+            hsb.setValue(hsb.value() - covered)
 
 
 class Table(QWidget):
+    # 保存进度: (已保存的变更数, 变更总数)
+    save_progress = pyqtSignal(int, int)
 
     def __init__(
         self,
         hide_columns: list[int] = [],
-        resize_mode=QHeaderView.ResizeMode.ResizeToContents,
+        resize_mode=QHeaderView.ResizeMode.Interactive,
         # selection_mode=QAbstractItemView.SelectionMode.MultiSelection,
-        func_fetch: Optional[Callable[[int], DataTable]] = None,
-        func_update: Optional[Callable[[List[Mapping]], None]] = None,
+        func_fetch: Optional[FetchFunc] = None,
+        func_update: Optional[UpdateFunc] = None,
+        scroll_mode: bool = False,
+        scroll_blocks: int = 10,
+        cache_size: int = 8,
+        cache_ttl: Optional[float] = 60,
+        fetch_debounce: int = 0,
+        save_batch_size: int = 0,
+        save_concurrency: int = 2,
+        fetch_fan_out: int = 4,
+        undo_limit: int = 100,
     ) -> None:
         super().__init__()
         self.resize_mode = resize_mode
         self.hide_columns = hide_columns
+        # 无限滚动模式: 滚动到底部时自动加载下一页, 不显示分页, 只读
+        self.scroll_mode = scroll_mode
+        self.scroll_blocks = scroll_blocks
+        # 最多可以撤销的操作数
+        self.undo_limit = undo_limit
 
-        self.model = DataModel(DataTable())
+        self.model: Any = DataModel(DataTable(), undo_limit=undo_limit)
 
         self.btn_add = MButton(
             "新增", color="success", icon="mdi.plus", on_click=self.add_row
@@ -356,16 +1462,66 @@ class Table(QWidget):
             "", icon="mdi.eye-off", tooltip="隐藏列", on_click=self.open_hide_dialog
         )
 
+        # 快速过滤, 输入停止一段时间后再过滤
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMaximumWidth(240)
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(300)
+        self._search_timer.timeout.connect(self._apply_search)
+        self.search_edit.textChanged.connect(self._search_timer.start)
+        self._search_index: Optional[SearchIndex] = None
+        self._search_building: Optional[DataTable] = None
+
+        self.btn_import = MButton("导入", on_click=self.import_file)
         self.btn_export = MButton("导出", on_click=self.export)
         self.btn_refresh = MButton("刷新", on_click=self.refresh)
 
         self.view = TableView(resize_mode=resize_mode)
+        paste = QShortcut(QKeySequence.StandardKey.Paste, self.view)
+        paste.setContext(Qt.ShortcutContext.WidgetShortcut)
+        paste.activated.connect(self.paste)
+        for key, slot in [
+            (QKeySequence.StandardKey.Undo, self.undo),
+            (QKeySequence.StandardKey.Redo, self.redo),
+        ]:
+            shortcut = QShortcut(key, self.view)
+            shortcut.setContext(Qt.ShortcutContext.WidgetShortcut)
+            shortcut.activated.connect(slot)
 
         self.page_widget = PagesWidget()
         self.page_widget.page_changed.connect(self._page_changed)
 
         self.func_fetch = func_fetch
         self.func_update = func_update
+        # 分页缓存, 显示某一页时在后台预取前后两页
+        self.page_cache = PageCache(cache_size, cache_ttl)
+        self._prefetching: Set[int] = set()
+        # 翻页请求的代数, 只使用最新一次请求的结果; fetch_debounce 毫秒内连续翻页时只请求最后一页
+        self.fetch_debounce = fetch_debounce
+        self._fetch_generation = 0
+        self._fetch_timer = QTimer(self)
+        self._fetch_timer.setSingleShot(True)
+        self._fetch_timer.timeout.connect(lambda: self._fetch_page(self._pending_page))
+        self._pending_page = 1
+        # 需要全部页的操作(导出等)同时获取的最大页数
+        self.fetch_fan_out = fetch_fan_out
+        # 分批保存: 每批最多 save_batch_size 个变更(0 表示不分批), 最多同时提交 save_concurrency 批
+        self.save_batch_size = save_batch_size
+        self.save_concurrency = save_concurrency
+        self._saving = False
+        self._save_queue: deque = deque()
+        self._save_running = 0
+        self._save_done = 0
+        self._save_total = 0
+        self._save_error: Optional[Exception] = None
+        self._failed_batches: List[List[Tuple[int, Dict[str, Any]]]] = []
+        # 当前显示的数据对应的页码, 同一页刷新时才合并数据
+        self._source_page: Optional[int] = None
+        # 保存期间到达了数据, 其中可能没有刚保存的变更, 保存结束后重新获取
+        self._refresh_after_save = False
         self._frozen_columns: list[str] = []
         self._hide_columns: list[str] = []
 
@@ -383,6 +1539,8 @@ class Table(QWidget):
             )
         )
         self.tool_layout.addStretch()
+        self.tool_layout.addWidget(self.search_edit)
+        self.tool_layout.addWidget(self.btn_import)
         self.tool_layout.addWidget(self.btn_export)
         self.tool_layout.addWidget(self.btn_refresh)
 
@@ -393,15 +1551,151 @@ class Table(QWidget):
 
         self.set_datatable(self.model.source)
 
+        if self.scroll_mode:
+            for widget in [
+                self.btn_add,
+                self.btn_save,
+                self.btn_delete,
+                self.btn_import,
+                self.search_edit,
+                self.page_widget,
+            ]:
+                widget.hide()
+            self.view.setSortingEnabled(False)
+
     def showEvent(self, a0: QShowEvent | None) -> None:
-        QTimer.singleShot(1, partial(self.page_widget.go_to, 1))
+        if not self.scroll_mode:
+            QTimer.singleShot(1, partial(self.page_widget.go_to, 1))
+        elif self.func_fetch and not isinstance(self.model, ScrollDataModel):
+            self.model = ScrollDataModel(self.func_fetch, max_blocks=self.scroll_blocks)
+            self.model.modelReset.connect(self._apply_column_state)
+            self.view.set_model(self.model)
+            self.model.fetchMore()
         return super().showEvent(a0)
 
     def add_row(self):
-        self.model.setRowCount(self.model.rowCount() + 1)
+        self.model.insertRows(self.model.rowCount(), 1)
+
+    def scroll_to_key(self, key: Any) -> bool:
+        """滚动到主键为 key 的行并设为当前行, 该行不在当前页时返回 False"""
+        if not isinstance(self.model, DataModel):
+            return False
+        row = self.model.key_row(key)
+        if row < 0:
+            return False
+        index = self.model.index(row, 0)
+        self.view.scrollTo(index, QAbstractItemView.ScrollHint.PositionAtCenter)
+        self.view.setCurrentIndex(index)
+        return True
+
+    def apply_update(self, key: Any, values: Mapping[str, Any]) -> bool:
+        """应用服务端推送的更新, 该行不在当前页时返回 False"""
+        if not isinstance(self.model, DataModel) or not self.model.apply_update(
+            key, values
+        ):
+            return False
+        if self.search_edit.text().strip():
+            self._search_building = None
+            self._build_search_index()
+        return True
+
+    def undo(self):
+        """撤销上一次编辑、新增或删除"""
+        if isinstance(self.model, DataModel):
+            self.model.undo_stack.undo()
+
+    def redo(self):
+        if isinstance(self.model, DataModel):
+            self.model.undo_stack.redo()
+
+    def paste(self):
+        """粘贴从表格软件复制的行(TSV), 作为新增的行插入到当前行之后"""
+        text = QGuiApplication.clipboard().text()
+        if self.scroll_mode or not text:
+            return
+        ObjectThread(
+            self,
+            importer.parse_text,
+            text,
+            self.model.all_headers(),
+            self._paste_names(),
+        ).on_success(partial(self._insert_imported, self._paste_row())).start()
+
+    def import_file(self, path: Optional[str] = None, format: Optional[str] = None):
+        """导入 CSV/TSV/JSON Lines 文件, 作为新增的行插入到末尾"""
+        if path is None:
+            filters = {
+                f"{label} (*{ext})": name
+                for name, (label, ext) in importer.FORMATS.items()
+            }
+            path, selected = QFileDialog.getOpenFileName(
+                self, "导入", "", ";;".join(filters)
+            )
+            if not path:
+                return
+            format = format or filters.get(selected)
+        if format is None:
+            format = next(
+                (
+                    name
+                    for name, (_, ext) in importer.FORMATS.items()
+                    if path.endswith(ext)
+                ),
+                "csv",
+            )
+        ObjectThread(
+            self,
+            importer.read_file,
+            path,
+            format,
+            self.model.all_headers(),
+            self._visible_names(),
+        ).on_success(partial(self._insert_imported, None)).on_exception(
+            lambda e: QMessageBox.warning(self, "导入失败", str(e))
+        ).start()
+
+    def _visible_names(self) -> List[str]:
+        return [
+            x.name
+            for i, x in enumerate(self.model.display_headers)
+            if not self.view.isColumnHidden(i)
+        ]
+
+    def _paste_names(self) -> List[str]:
+        """没有表头时从当前列开始按顺序对应显示的列"""
+        names = self._visible_names()
+        current = self.view.currentIndex()
+        if current.isValid():
+            name = self.model.display_headers[current.column()].name
+            if name in names:
+                return names[names.index(name) :]
+        return names
+
+    def _paste_row(self) -> int:
+        current = self.view.currentIndex()
+        return current.row() + 1 if current.isValid() else self.model.rowCount()
+
+    def _insert_imported(self, row: Optional[int], parsed: importer.Parsed):
+        rows, errors = parsed
+        if rows:
+            if row is None or row > self.model.rowCount():
+                row = self.model.rowCount()
+            self.model.insert_new_rows(row, rows)
+            logger.info("新增 {} 行", len(rows))
+        if errors:
+            logger.warning("跳过 {} 行无效的数据: {}", len(errors), errors)
+            # 只显示前几条错误
+            details = "\n".join(errors[:10])
+            if len(errors) > 10:
+                details += f"\n... 共 {len(errors)} 行"
+            QMessageBox.warning(
+                self,
+                "警告",
+                f"已新增 {len(rows)} 行, 跳过 {len(errors)} 行无效的数据:\n{details}",
+            )
 
     def open_frozen_dialog(self):
-        items = [Item(name=x.name, label=x.label) for x in self.model.source.headers]
+        items = [Item(name=x.name, label=x.label) for x in self.model.all_headers()]
         dialog = SelectDialog(
             items,
             title="选择冻结的列",
@@ -412,12 +1706,12 @@ class Table(QWidget):
         if dialog.exec() != QDialog.DialogCode.Accepted:
             return
         self._frozen_columns = dialog.get_selected_items()
-        self.set_datatable(self.model.source)
+        self._apply_column_state()
 
     def open_hide_dialog(self):
         """隐藏列选择器"""
         dialog = SelectDialog(
-            [Item(name=x.name, label=x.label) for x in self.model.source.headers],
+            [Item(name=x.name, label=x.label) for x in self.model.all_headers()],
             title="选择隐藏的列",
             selected=self._hide_columns,
             multiple_select=True,
@@ -426,48 +1720,108 @@ class Table(QWidget):
         if dialog.exec() != QDialog.DialogCode.Accepted:
             return
         self._hide_columns = dialog.get_selected_items()
-        self.set_datatable(self.model.source)
+        self._apply_column_state()
+
+    def _apply_column_state(self):
+        """按冻结列和隐藏列调整列, 只修改列的映射, 不重建模型"""
+        names = self.model.header_names()
+        frozen = [x for x in names if x in self._frozen_columns]
+        self.model.set_column_order(
+            frozen + [x for x in names if x not in self._frozen_columns]
+        )
+        for i, name in enumerate(self.model.header_names()):
+            self.view.setColumnHidden(i, name in self._hide_columns)
+        self.view.set_frozen_columns(len(frozen))
 
     def refresh(self):
+        if isinstance(self.model, ScrollDataModel):
+            self.model.reset()
+            self.model.fetchMore()
+            return
+        if self._saving:
+            return
+        self.page_cache.invalidate(self.page_widget.current_page)
         self.page_widget.go_to(self.page_widget.current_page)
 
-    def set_datatable(self, dt: DataTable):
-        # 调整冻结列
-        self.model = DataModel(dt, top_headers=self._frozen_columns)
-        self.view.frozen_columns = len(self._frozen_columns)
+    def set_datatable(self, dt: DataTable, page: Optional[int] = None):
+        """显示数据; page 与当前显示的页相同(刷新)时按主键合并, 否则重新创建模型
+
+        保存期间行标识不能变化, 丢弃到达的数据, 保存结束后重新获取。
+        """
+        if self._saving:
+            self._refresh_after_save = True
+            return
+        # 行标识可能已经变化, 之前保存失败的批次不能再重试
+        self._failed_batches = []
+        same_page = page is not None and page == self._source_page
+        self._source_page = page
+        if same_page and self.model.reconcile(dt):
+            self.page_widget.set_total_page(dt.max_page)
+        else:
+            self.model = DataModel(dt, undo_limit=self.undo_limit)
+            self.view.set_model(self.model)
+            self._apply_column_state()
+            self.page_widget.set_total_page(dt.max_page)
+        if self.search_edit.text().strip():
+            self._build_search_index()
+
+    def _apply_search(self):
+        """按搜索框的内容过滤行"""
+        query = self.search_edit.text().strip()
+        if not query:
+            self.model.set_row_filter(None)
+            return
+        index = self._search_index
+        if index is None or index.source is not self.model.source:
+            # 索引建立完成后再过滤
+            self._build_search_index()
+            return
+        self.model.filter_rows(index, query)
 
-        self.view.set_model(self.model)
+    def _build_search_index(self):
+        """在后台为当前数据建立搜索索引"""
+        source = self.model.source
+        if self._search_building is source:
+            return
+        self._search_building = source
+        ObjectThread(self, SearchIndex, source).with_priority(PRIORITY_LOW).on_success(
+            self._search_index_built
+        ).start()
 
-        for i, header in enumerate(self.model.display_headers):
-            self.view.setColumnHidden(i, header.name in self._hide_columns)
-            self.view.frozen_tableview.setColumnHidden(
-                i, header.name in self._hide_columns
-            )
-        self.page_widget.set_total_page(dt.max_page)
+    def _search_index_built(self, index: SearchIndex):
+        if self._search_building is index.source:
+            self._search_building = None
+        if index.source is not self.model.source:
+            return
+        self._search_index = index
+        self._apply_search()
 
     def delete_selected_row(self):
         """删除当前选中行"""
-        selected_indexes = self.view.selectedIndexes()
+        sm = self.view.selectionModel()
+        # 按选择区间取行号, 不需要遍历每个单元格
+        rows: Set[int] = set()
+        if sm:
+            for selection_range in sm.selection():
+                rows.update(range(selection_range.top(), selection_range.bottom() + 1))
 
-        if not selected_indexes:
+        if not rows:
             QMessageBox.warning(self, "警告", "请先选择要删除的行！")
             return
 
-        rows = set([x.row() + 1 for x in selected_indexes])
-
         # 确认对话框
         reply = QMessageBox.question(
             self,
             "确认删除",
-            f"确定要删除第 {rows} 行吗",
+            f"确定要删除选中的 {len(rows)} 行吗",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No,
         )
         if reply == QMessageBox.StandardButton.Yes:
-            rows_to_delete = sorted(rows, reverse=True)
-            for row in rows_to_delete:
-                self.model.removeRow(row - 1)
-            # QMessageBox.information(self, "成功", f"已删除第行 {rows_to_delete}")
+            # 先清除选择和当前行, 避免每删除一个区间都要更新一次选择
+            if sm:
+                sm.clear()
+            self.model.remove_rows(rows)
 
     def iterrows(self, role=Qt.ItemDataRole.DisplayRole):
         if self.model is None:
@@ -482,45 +1836,294 @@ class Table(QWidget):
         """页码改变时触发"""
         if not self.func_fetch:
             return
-        DataTableThread(self, self.func_fetch, page).on_started(
-            partial(self.setEnabled, False)
-        ).on_finished(partial(self.setEnabled, True)).on_success(
-            self.set_datatable
+        # 新的请求使之前还未返回的请求失效
+        self._fetch_generation += 1
+        self._fetch_timer.stop()
+        cached = self.page_cache.get(page)
+        if cached is not None:
+            self.view.setEnabled(True)
+            self.set_datatable(cached, page)
+            self._prefetch(page)
+            return
+        if self.fetch_debounce > 0:
+            # 快速翻页时只请求最后一页
+            self._pending_page = page
+            self._fetch_timer.start(self.fetch_debounce)
+            return
+        self._fetch_page(page)
+
+    def _fetch_page(self, page: int):
+        generation = self._fetch_generation
+        self.view.setEnabled(False)
+        # 流式加载的页在全部数据到达后才放入缓存
+        stream: Dict[str, DataTable] = {}
+        DataTableThread(self, self.func_fetch, page).with_priority(
+            PRIORITY_HIGH
+        ).on_success(partial(self._page_fetched, generation, page, stream)).on_chunk(
+            partial(self._page_chunk_fetched, generation, stream)
+        ).on_exception(
+            partial(self._page_fetch_failed, page, stream)
+        ).on_finished(
+            partial(self._page_fetch_finished, generation, page, stream)
         ).start()
 
+    def _page_fetch_finished(
+        self, generation: int, page: int, stream: Dict[str, DataTable]
+    ):
+        self._stream_finished(page, stream)
+        dt = stream.get("dt")
+        if (
+            generation == self._fetch_generation
+            and dt is not None
+            and dt is not self.model.source
+        ):
+            # 刷新时全部数据到达后再合并
+            self.set_datatable(dt, page)
+            self._prefetch(page)
+        if generation == self._fetch_generation:
+            self.view.setEnabled(True)
+            if self.search_edit.text().strip():
+                self._build_search_index()
+
+    def _page_fetch_failed(self, page: int, stream: Dict[str, DataTable], e: Exception):
+        # 流式加载中途失败时数据不完整, 不放入缓存
+        stream.clear()
+        logger.error("获取第 {} 页数据失败: {}", page, e)
+
+    def _page_chunk_fetched(
+        self,
+        generation: int,
+        stream: Dict[str, DataTable],
+        chunk: Union[DataTable, Sequence[Mapping]],
+    ):
+        """流式加载时追加一批行"""
+        if generation == self._fetch_generation:
+            # 第一批数据到达后即可操作
+            self.view.setEnabled(True)
+        self._stream_chunk(stream, chunk)
+
+    def _stream_started(self, stream: Dict[str, DataTable], dt: DataTable):
+        stream["dt"] = dt
+
+    def _stream_chunk(
+        self, stream: Dict[str, DataTable], chunk: Union[DataTable, Sequence[Mapping]]
+    ):
+        dt = stream.get("dt")
+        if dt is None:
+            return
+        rows = list(chunk.rows()) if isinstance(chunk, DataTable) else chunk
+        if isinstance(self.model, DataModel) and dt is self.model.source:
+            # 正在显示的页通过模型追加, 保持模型的行与 source 一致
+            self.model.append_rows(rows)
+        else:
+            dt.extend(rows)
+
+    def _stream_finished(self, page: int, stream: Dict[str, DataTable]):
+        dt = stream.get("dt")
+        if dt is not None:
+            self.page_cache.put(page, dt)
+
+    def _page_fetched(
+        self, generation: int, page: int, stream: Dict[str, DataTable], dt: DataTable
+    ):
+        self._stream_started(stream, dt)
+        if generation != self._fetch_generation:
+            logger.debug("丢弃过期的第 {} 页数据", page)
+            return
+        if (
+            page == self._source_page
+            and isinstance(self.model, DataModel)
+            and self.model.can_reconcile(dt)
+        ):
+            # 流式加载时第一批数据只包含部分行, 现在合并会把还没到达的行当作已删除,
+            # 在 _page_fetch_finished 中合并
+            return
+        self.set_datatable(dt, page)
+        self._prefetch(page)
+
+    def _prefetch(self, page: int):
+        """在后台预取相邻的页"""
+        if not self.func_fetch or self.page_cache.size <= 0:
+            return
+        for n in (page + 1, page - 1):
+            if (
+                not 1 <= n <= self.page_widget.total_page
+                or n in self.page_cache
+                or n in self._prefetching
+            ):
+                continue
+            self._prefetching.add(n)
+            stream: Dict[str, DataTable] = {}
+            DataTableThread(self, self.func_fetch, n).with_priority(
+                PRIORITY_LOW
+            ).on_success(partial(self._stream_started, stream)).on_chunk(
+                partial(self._stream_chunk, stream)
+            ).on_exception(
+                partial(self._page_fetch_failed, n, stream)
+            ).on_finished(
+                partial(self._prefetch_finished, n, stream)
+            ).start()
+
+    def _prefetch_finished(self, page: int, stream: Dict[str, DataTable]):
+        self._prefetching.discard(page)
+        self._stream_finished(page, stream)
+
     def save(self):
-        if not self.func_update:
+        if not self.func_update or self._saving:
             return
-        changes = self.model.compare()
+        changes = self.model.changes()
         if not changes:
             logger.info("没有数据被修改")
             return
-        logger.info("变化的数据: {}", changes)
-        ListThread(self, self.func_update, changes).on_started(
-            partial(self.setEnabled, False)
-        ).on_finished(partial(self.setEnabled, True)).on_exception(
-            lambda e: logger.error("更新失败: {}", e), self._save_failed
-        ).start()
+        logger.info("变化的数据: {} 条", len(changes))
+        logger.opt(lazy=True).debug("变化的数据: {}", lambda: [x for _, x in changes])
+        self._start_save(changes)
+
+    def retry_failed(self):
+        """重新保存上一次保存失败的批次, 使用这些行当前的变更"""
+        if not self.func_update or self._saving or not self._failed_batches:
+            return
+        row_ids = {row_id for batch in self._failed_batches for row_id, _ in batch}
+        self._failed_batches = []
+        changes = [x for x in self.model.changes() if x[0] in row_ids]
+        if changes:
+            self._start_save(changes)
+
+    def _start_save(self, changes: List[Tuple[int, Dict[str, Any]]]):
+        size = self.save_batch_size if self.save_batch_size > 0 else len(changes)
+        self._save_queue = deque(
+            changes[i : i + size] for i in range(0, len(changes), size)
+        )
+        self._save_running = 0
+        self._save_done = 0
+        self._save_total = len(changes)
+        self._save_error = None
+        self._failed_batches = []
+        # 保存期间仍然可以编辑, 只禁止再次保存和切换数据
+        self._set_saving(True)
+        self.save_progress.emit(0, self._save_total)
+        self._dispatch_save()
+
+    def _set_saving(self, saving: bool):
+        self._saving = saving
+        for widget in (self.btn_save, self.btn_refresh, self.page_widget):
+            widget.setEnabled(not saving)
+
+    def _dispatch_save(self):
+        while self._save_queue and self._save_running < max(self.save_concurrency, 1):
+            batch = self._save_queue.popleft()
+            self._save_running += 1
+            ListThread(self, self.func_update, [x for _, x in batch]).on_success(
+                partial(self._batch_saved, self.model, batch)
+            ).on_exception(partial(self._batch_failed, batch)).on_finished(
+                self._batch_finished
+            ).start()
+
+    def _batch_saved(self, model: DataModel, batch: List[Tuple[int, Dict[str, Any]]]):
+        if model is self.model:
+            model.commit(batch)
+        self._save_done += len(batch)
+        self.save_progress.emit(self._save_done, self._save_total)
+
+    def _batch_failed(self, batch: List[Tuple[int, Dict[str, Any]]], e: Exception):
+        logger.error("更新失败: {}", e)
+        self._failed_batches.append(batch)
+        self._save_error = e
+
+    def _batch_finished(self):
+        self._save_running -= 1
+        self._dispatch_save()
+        if self._save_running:
+            return
+        self._set_saving(False)
+        if self.search_edit.text().strip():
+            # 保存后 source 发生了变化, 重新建立搜索索引
+            self._search_building = None
+            self._build_search_index()
+        if self._save_error is not None:
+            self._save_failed(self._save_error)
+        if self._refresh_after_save and not self._saving:
+            self._refresh_after_save = False
+            self.refresh()
 
     def _save_failed(self, e: Exception):
-        QMessageBox.warning(self, "更新失败", str(e))
-
-    def export(self):
-        """导出数据"""
-        output: Optional[str] = None
-        format: Optional[str] = None
-        export_io = sys.stdout if output is None else open(output, "w")
-        if format == "csv":
-            split_char = ","
+        failed = sum(len(x) for x in self._failed_batches)
+        if failed < self._save_total:
+            message = (
+                f"{failed}/{self._save_total} 个变更保存失败, 是否重试失败的部分\n{e}"
+            )
         else:
-            split_char = "\t"
+            message = f"保存失败, 是否重试\n{e}"
+        reply = QMessageBox.warning(
+            self,
+            "更新失败",
+            message,
+            QMessageBox.StandardButton.Retry | QMessageBox.StandardButton.Cancel,
+            QMessageBox.StandardButton.Cancel,
+        )
+        if reply == QMessageBox.StandardButton.Retry:
+            self.retry_failed()
+
+    def export(
+        self,
+        output: Optional[str] = None,
+        format: Optional[str] = None,
+        all_pages: Optional[bool] = None,
+    ) -> Optional[Exporter]:
+        """在后台导出显示的列, 未指定文件时弹出文件选择框
 
-        export_io.write(split_char.join(self.model.header_labels()) + "\n")
-        for row in self.iterrows():
-            export_io.write(split_char.join(row) + "\n")
+        all_pages 为 True 时通过 func_fetch 依次获取并导出全部的页, 为 None 时询问。
+        """
+        if output is None:
+            filters = {
+                f"{label} (*{ext})": name for name, (label, ext, _) in FORMATS.items()
+            }
+            output, selected = QFileDialog.getSaveFileName(
+                self, "导出", "", ";;".join(filters)
+            )
+            if not output:
+                return None
+            format = format or filters.get(selected)
+        if format is None:
+            format = next(
+                (name for name, (_, ext, _) in FORMATS.items() if output.endswith(ext)),
+                "csv",
+            )
+        if all_pages is None:
+            all_pages = self.scroll_mode or (
+                self.func_fetch is not None
+                and self.page_widget.total_page > 1
+                and QMessageBox.question(self, "导出", "是否导出全部的页?")
+                == QMessageBox.StandardButton.Yes
+            )
+        headers = [
+            x
+            for i, x in enumerate(self.model.display_headers)
+            if not self.view.isColumnHidden(i)
+        ]
+        names = [x.name for x in headers]
+        if all_pages and self.func_fetch:
+            chunks = partial(
+                page_rows, self.func_fetch, names, fan_out=self.fetch_fan_out
+            )
+        else:
+            chunks = partial(list_rows, list(self.model.values(names)))
+        exporter = Exporter(
+            self, output, format, names, [x.text() for x in headers], chunks
+        )
 
-        if export_io is not sys.stdout:
-            export_io.close()
+        progress = QProgressDialog("正在导出...", "取消", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(exporter.cancel)
+        exporter.progress.connect(
+            lambda done, total: (progress.setMaximum(total), progress.setValue(done))
+        )
+        exporter.failed.connect(lambda e: QMessageBox.warning(self, "导出失败", str(e)))
+        exporter.finished.connect(progress.close)
+        exporter.finished.connect(progress.deleteLater)
+        exporter.finished.connect(exporter.deleteLater)
+        return exporter.start()
 
     def drag_columns(self):
         dialog = DraggableListDialog(
@@ -536,9 +2139,6 @@ class Table(QWidget):
             return
         items = dialog.get_current_order()
 
-        headers_map = {x.name: x for x in self.model.display_headers}
-        display_headers = [headers_map[x] for x in self._frozen_columns] + [
-            headers_map[x] for x in items
-        ]
-        self.model.display_headers = display_headers
-        self.model.refresh()
+        self.model.set_column_order(
+            [x for x in self.model.header_names() if x in self._frozen_columns] + items
+        )
@@ -0,0 +1,272 @@
+import abc
+import csv
+import json
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from loguru import logger
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from pydashboard.job import PRIORITY_LOW, ObjectThread, iter_pages
+from pydashboard.models import DataTable
+
+# 每次写入的最大行数
+CHUNK_ROWS = 5000
+
+Rows = List[List[Any]]
+
+
+class Writer(abc.ABC):
+    """按块写入行的导出格式"""
+
+    binary = False
+
+    def __init__(self, fp: IO, names: List[str], labels: List[str]):
+        self.fp = fp
+        self.names = names
+        self.labels = labels
+
+    @abc.abstractmethod
+    def write_rows(self, rows: Rows):
+        """写入一块行, 每一行的值按 names 的顺序排列"""
+
+    def close(self):
+        pass
+
+
+class CsvWriter(Writer):
+    """RFC 4180 CSV: 逗号分隔, CRLF 换行, 必要时加双引号"""
+
+    delimiter = ","
+
+    def __init__(self, fp: IO, names: List[str], labels: List[str]):
+        super().__init__(fp, names, labels)
+        self._writer = csv.writer(fp, delimiter=self.delimiter, lineterminator="\r\n")
+        self._writer.writerow(labels)
+
+    def write_rows(self, rows: Rows):
+        self._writer.writerows([["" if x is None else x for x in row] for row in rows])
+
+
+class TsvWriter(CsvWriter):
+    delimiter = "\t"
+
+
+class JsonLinesWriter(Writer):
+    """每行一个 JSON 对象, 键为列名"""
+
+    def write_rows(self, rows: Rows):
+        names = self.names
+        self.fp.write(
+            "".join(
+                json.dumps(dict(zip(names, row)), ensure_ascii=False, default=str)
+                + "\n"
+                for row in rows
+            )
+        )
+
+
+class ColumnarWriter(Writer):
+    """紧凑的二进制列存储格式
+
+    文件头: MAGIC, uint32 长度 + JSON {"names": [...], "labels": [...]}
+    之后为若干行组: uint32 行数, 每列一个 类型(1字节) + uint32 长度 + 数据,
+    类型 q/d 为小端 int64/float64 数组, j 为 UTF-8 JSON 数组; 行数为 0 表示结束。
+    """
+
+    MAGIC = b"PDCOL\x01"
+    binary = True
+
+    def __init__(self, fp: IO, names: List[str], labels: List[str]):
+        super().__init__(fp, names, labels)
+        meta = json.dumps({"names": names, "labels": labels}).encode()
+        fp.write(self.MAGIC + struct.pack("<I", len(meta)) + meta)
+
+    @staticmethod
+    def _encode(values: List[Any]) -> bytes:
+        for typecode, kind in (("q", int), ("d", float)):
+            if all(type(x) is kind for x in values):
+                try:
+                    packed = array(typecode, values)
+                except OverflowError:
+                    break
+                if sys.byteorder == "big":
+                    packed.byteswap()
+                data = packed.tobytes()
+                return typecode.encode() + struct.pack("<I", len(data)) + data
+        data = json.dumps(values, ensure_ascii=False, default=str).encode()
+        return b"j" + struct.pack("<I", len(data)) + data
+
+    def write_rows(self, rows: Rows):
+        if not rows:
+            return
+        parts = [struct.pack("<I", len(rows))]
+        parts.extend(self._encode(list(column)) for column in zip(*rows))
+        self.fp.write(b"".join(parts))
+
+    def close(self):
+        self.fp.write(struct.pack("<I", 0))
+
+
+def read_columnar(fp: IO) -> Iterator[Dict[str, List[Any]]]:
+    """读取 ColumnarWriter 写入的文件, 逐个返回行组 {列名: 值列表}"""
+    if fp.read(len(ColumnarWriter.MAGIC)) != ColumnarWriter.MAGIC:
+        raise ValueError("not a columnar export file")
+    (size,) = struct.unpack("<I", fp.read(4))
+    names = json.loads(fp.read(size))["names"]
+    while True:
+        (count,) = struct.unpack("<I", fp.read(4))
+        if count == 0:
+            return
+        group = {}
+        for name in names:
+            kind = fp.read(1).decode()
+            (size,) = struct.unpack("<I", fp.read(4))
+            data = fp.read(size)
+            if kind == "j":
+                group[name] = json.loads(data)
+                continue
+            values = array(kind)
+            values.frombytes(data)
+            if sys.byteorder == "big":
+                values.byteswap()
+            group[name] = values.tolist()
+        yield group
+
+
+# {格式: (说明, 扩展名, 写入类)}
+FORMATS: Dict[str, Tuple[str, str, Type[Writer]]] = {
+    "csv": ("CSV", ".csv", CsvWriter),
+    "tsv": ("TSV", ".tsv", TsvWriter),
+    "jsonl": ("JSON Lines", ".jsonl", JsonLinesWriter),
+    "pdcol": ("列存储", ".pdcol", ColumnarWriter),
+}
+
+
+def table_rows(dt: DataTable, names: List[str]) -> Iterator[Rows]:
+    """按块读取 DataTable 中指定列的行"""
+    columns = [dt.column(name) for name in names]
+    count = dt.row_count()
+    for start in range(0, count, CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, count)
+        yield [list(x) for x in zip(*(column[start:stop] for column in columns))]
+
+
+def list_rows(rows: Rows, exporter: "Exporter") -> Iterator[Rows]:
+    """按块读取已经在内存中的行"""
+    for start in range(0, len(rows), CHUNK_ROWS):
+        yield rows[start : start + CHUNK_ROWS]
+        exporter.progress.emit(min(start + CHUNK_ROWS, len(rows)), len(rows))
+
+
+def page_rows(
+    func_fetch: Callable[[int], Any],
+    names: List[str],
+    exporter: "Exporter",
+    fan_out: int = 4,
+) -> Iterator[Rows]:
+    """并行获取全部的页, 按页码顺序按块读取指定列的行"""
+    max_page = 1
+    for page, dt in iter_pages(func_fetch, fan_out):
+        if exporter.cancelled():
+            return
+        if page == 1:
+            max_page = dt.max_page
+        yield from table_rows(dt, names)
+        exporter.progress.emit(page, max_page)
+
+
+class Exporter(QObject):
+    """在后台导出数据, 边读取边写入文件
+
+    chunks(exporter) 返回按顺序读取行块的迭代器, 在工作线程中执行, 由它通过
+    exporter.progress 通知进度 (已完成, 总数)。取消或失败时删除未写完的文件。
+    """
+
+    progress = pyqtSignal(int, int)
+    succeeded = pyqtSignal(str)
+    failed = pyqtSignal(Exception)
+    # 成功、失败或取消后都会通知
+    finished = pyqtSignal()
+
+    def __init__(
+        self,
+        parent: Optional[QObject],
+        output: str,
+        format: str,
+        names: List[str],
+        labels: List[str],
+        chunks: Callable[["Exporter"], Iterable[Rows]],
+    ):
+        super().__init__(parent)
+        if format not in FORMATS:
+            raise ValueError(f"unknown export format: {format}")
+        self.output = output
+        self.format = format
+        self.names = names
+        self.labels = labels
+        self.chunks = chunks
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def start(self):
+        ObjectThread(self, self._run).with_priority(PRIORITY_LOW).on_success(
+            self._done
+        ).on_exception(self._failed).on_finished(self.finished.emit).start()
+        return self
+
+    def _run(self) -> bool:
+        writer_cls = FORMATS[self.format][2]
+        if writer_cls.binary:
+            fp = open(self.output, "wb")
+        else:
+            fp = open(self.output, "w", encoding="utf-8", newline="")
+        rows = 0
+        try:
+            writer = writer_cls(fp, self.names, self.labels)
+            for chunk in self.chunks(self):
+                if self.cancelled():
+                    break
+                writer.write_rows(chunk)
+                rows += len(chunk)
+            if not self.cancelled():
+                writer.close()
+        finally:
+            fp.close()
+            if self.cancelled():
+                os.remove(self.output)
+        if self.cancelled():
+            logger.info("取消导出 {}", self.output)
+            return False
+        logger.info("导出 {} 行到 {}", rows, self.output)
+        return True
+
+    def _done(self, completed: bool):
+        if completed:
+            self.succeeded.emit(self.output)
+
+    def _failed(self, e: Exception):
+        logger.error("导出失败: {}", e)
+        if os.path.exists(self.output):
+            os.remove(self.output)
+        self.failed.emit(e)
@@ -0,0 +1,109 @@
+import datetime
+import decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable
+
+from pydashboard.models import TableHeader
+
+Formatter = Callable[[Any], str]
+
+
+def _default(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+def _number(header: TableHeader) -> Formatter:
+    spec = ("," if header.thousands else "") + (
+        f".{header.precision}f" if header.precision is not None else ""
+    )
+
+    def format_number(value: Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            try:
+                value = int(value)
+            except ValueError:
+                try:
+                    value = float(value)
+                except ValueError:
+                    return value
+        if isinstance(value, bool) or not isinstance(
+            value, (int, float, decimal.Decimal)
+        ):
+            return str(value)
+        return format(value, spec)
+
+    return format_number
+
+
+def _datetime(pattern: str) -> Formatter:
+    def format_datetime(value: Any) -> str:
+        if value is None:
+            return ""
+        try:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = datetime.datetime.fromtimestamp(value)
+            elif isinstance(value, str):
+                value = datetime.datetime.fromisoformat(value)
+        except (ValueError, OverflowError, OSError):
+            return str(value)
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.strftime(pattern)
+        return str(value)
+
+    return format_datetime
+
+
+def _bool(labels: Iterable[str]) -> Formatter:
+    true_label, false_label = labels
+
+    def format_bool(value: Any) -> str:
+        if isinstance(value, bool):
+            return true_label if value else false_label
+        return _default(value)
+
+    return format_bool
+
+
+def _enum(labels: Dict[Any, str]) -> Formatter:
+    # 从 JSON 得到的映射的键都是字符串
+    by_text = {str(k): v for k, v in labels.items()}
+
+    def format_enum(value: Any) -> str:
+        if value is None:
+            return ""
+        label = by_text.get(str(value))
+        return label if label is not None else str(value)
+
+    return format_enum
+
+
+def compile_formatter(header: TableHeader, cache_size: int = 4096) -> Formatter:
+    """根据列的格式设置生成格式化函数, 结果按值缓存最多 cache_size 个"""
+    if header.enum_labels:
+        func = _enum(header.enum_labels)
+    elif header.bool_labels:
+        func = _bool(header.bool_labels)
+    elif header.datetime_format:
+        func = _datetime(header.datetime_format)
+    elif header.precision is not None or header.thousands:
+        func = _number(header)
+    else:
+        return _default
+
+    cached = lru_cache(maxsize=cache_size, typed=True)(func)
+
+    def format_value(value: Any) -> str:
+        try:
+            return cached(value)
+        except TypeError:
+            # 不可哈希的值不缓存
+            return func(value)
+
+    return format_value
+
+
+def compile_formatters(headers: Iterable[TableHeader]) -> Dict[str, Formatter]:
+    """每一列的格式化函数 {列名: 格式化函数}"""
+    return {x.name: compile_formatter(x) for x in headers}
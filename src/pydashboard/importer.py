@@ -0,0 +1,133 @@
+import csv
+import io
+import itertools
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydashboard.models import TableHeader
+from pydashboard.schema import Parser, compile_parsers
+
+# {格式: (说明, 扩展名)}
+FORMATS = {
+    "csv": ("CSV", ".csv"),
+    "tsv": ("TSV", ".tsv"),
+    "jsonl": ("JSON Lines", ".jsonl"),
+}
+
+# (解析成功的行, 被跳过的行的错误信息)
+Parsed = Tuple[List[Dict[str, Any]], List[str]]
+
+
+def _lookup(headers: Sequence[TableHeader]) -> Dict[str, str]:
+    """列名和显示名 -> 列名"""
+    lookup = {x.text(): x.name for x in headers}
+    lookup.update({x.name: x.name for x in headers})
+    return lookup
+
+
+def _header_names(
+    first: Sequence[str], headers: Sequence[TableHeader]
+) -> Optional[List[Optional[str]]]:
+    """第一行是表头(列名或显示名)时返回每一列对应的列名, 否则返回 None"""
+    lookup = _lookup(headers)
+    cells = [x.strip() for x in first]
+    if not any(cells) or not all(x in lookup for x in cells if x):
+        return None
+    return [lookup.get(x) for x in cells]
+
+
+def _typed(row: Dict[str, Any], parsers: Dict[str, Parser]) -> Dict[str, Any]:
+    """按列的类型解析值, 无法解析或者校验失败时抛出 ValueError"""
+    for name, value in row.items():
+        parser = parsers.get(name)
+        if parser is None:
+            continue
+        try:
+            row[name] = parser(value)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"{name}: {e}") from e
+    return row
+
+
+def parse_records(
+    records: Iterable[Sequence[str]],
+    headers: Sequence[TableHeader],
+    names: Sequence[str],
+) -> Parsed:
+    """将文本记录转换为行
+
+    第一行是表头时按表头对应列, 否则按顺序对应 names 中的列; 空单元格忽略。
+    值按列的类型解析, 存在无法解析的值的行跳过, 并返回错误信息。
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return [], []
+    columns = _header_names(first, headers)
+    start = 2
+    if columns is None:
+        columns = list(names)
+        records = itertools.chain([first], records)
+        start = 1
+    parsers = compile_parsers(headers)
+    rows, errors = [], []
+    for line, record in enumerate(records, start):
+        row = {name: value for name, value in zip(columns, record) if name and value}
+        if not row:
+            continue
+        try:
+            rows.append(_typed(row, parsers))
+        except ValueError as e:
+            errors.append(f"第 {line} 行 {e}")
+    return rows, errors
+
+
+def parse_text(
+    text: str,
+    headers: Sequence[TableHeader],
+    names: Sequence[str],
+    delimiter: str = "\t",
+) -> Parsed:
+    """解析从表格软件复制的文本(默认为 TSV)"""
+    return parse_records(
+        csv.reader(io.StringIO(text), delimiter=delimiter), headers, names
+    )
+
+
+def read_file(
+    path: str,
+    format: str,
+    headers: Sequence[TableHeader],
+    names: Sequence[str],
+) -> Parsed:
+    """读取 CSV/TSV/JSON Lines 文件"""
+    with open(path, encoding="utf-8-sig", newline="") as fp:
+        if format == "jsonl":
+            lookup = _lookup(headers)
+            parsers = compile_parsers(headers)
+            rows, errors = [], []
+            for number, line in enumerate(fp, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    errors.append(f"第 {number} 行 无效的 JSON: {e}")
+                    continue
+                if not isinstance(record, dict):
+                    errors.append(f"第 {number} 行 不是 JSON 对象")
+                    continue
+                row = {
+                    lookup[k]: v
+                    for k, v in record.items()
+                    if k in lookup and v is not None
+                }
+                if not row:
+                    continue
+                try:
+                    rows.append(_typed(row, parsers))
+                except ValueError as e:
+                    errors.append(f"第 {number} 行 {e}")
+            return rows, errors
+        delimiter = "\t" if format == "tsv" else ","
+        return parse_records(csv.reader(fp, delimiter=delimiter), headers, names)
@@ -1,19 +1,208 @@
-from typing import Any, Callable
+import asyncio
+import inspect
+import threading
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Set, Tuple
 
-from PyQt6.QtCore import QThread, pyqtBoundSignal, pyqtSignal
+from PyQt6 import sip
+from PyQt6.QtCore import (
+    QObject,
+    QRunnable,
+    QThreadPool,
+    pyqtBoundSignal,
+    pyqtSignal,
+    pyqtSlot,
+)
 
 from pydashboard.models import DataTable
 
+# 任务优先级, 数值越大越先执行
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
 
-class CommonThread(QThread):
+_POOL: Optional[QThreadPool] = None
+_MAX_WORKERS = 8
+
+
+def thread_pool() -> QThreadPool:
+    """所有任务共享的线程池"""
+    global _POOL
+    if _POOL is None:
+        _POOL = QThreadPool()
+        _POOL.setMaxThreadCount(_MAX_WORKERS)
+    return _POOL
+
+
+def set_max_workers(count: int):
+    """设置同时执行的最大任务数"""
+    global _MAX_WORKERS
+    _MAX_WORKERS = max(count, 1)
+    if _POOL is not None:
+        _POOL.setMaxThreadCount(_MAX_WORKERS)
+
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    """所有异步任务共享的事件循环, 运行在一个后台线程中"""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(
+                target=_LOOP.run_forever, name="pydashboard-asyncio", daemon=True
+            ).start()
+    return _LOOP
+
+
+async def _awaited(awaitable) -> Any:
+    return await awaitable
+
+
+def iter_result(result: Any) -> Iterator:
+    """在工作线程中将 func 的返回值统一转换为同步迭代器
+
+    普通值只有一项; 协程在事件循环中执行并等待结果; 异步迭代器在事件循环中逐项读取。
+    """
+    if inspect.isawaitable(result):
+        result = asyncio.run_coroutine_threadsafe(
+            _awaited(result), event_loop()
+        ).result()
+    if isinstance(result, Iterator):
+        return result
+    if isinstance(result, AsyncIterator):
+        return _iter_async(result)
+    return iter([result])
+
+
+def _iter_async(iterator: AsyncIterator) -> Iterator:
+    loop = event_loop()
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(
+                _awaited(iterator.__anext__()), loop
+            ).result()
+        except StopAsyncIteration:
+            return
+
+
+def fetch_page(func_fetch: Callable[[int], Any], page: int) -> DataTable:
+    """在工作线程中获取一页, 流式结果合并为一个 DataTable"""
+    dt: Optional[DataTable] = None
+    for item in iter_result(func_fetch(page)):
+        if dt is None:
+            dt = item
+        else:
+            dt.extend(list(item.rows()) if isinstance(item, DataTable) else item)
+    return dt if dt is not None else DataTable()
+
+
+class _FutureRunnable(QRunnable):
+    """在共享线程池中执行 func, 结果保存在 future 中"""
+
+    def __init__(self, func: Callable, *args):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.func = func
+        self.args = args
+        self.future: Future = Future()
+
+    def run(self) -> None:
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            self.future.set_result(self.func(*self.args))
+        except BaseException as e:
+            self.future.set_exception(e)
+
+    def result(self) -> Any:
+        """等待结果; 还在排队时直接在当前线程中执行, 避免线程池已满时互相等待"""
+        if thread_pool().tryTake(self):
+            self.run()
+        return self.future.result()
+
+    def cancel(self):
+        if thread_pool().tryTake(self):
+            self.future.cancel()
+
+
+def iter_pages(
+    func_fetch: Callable[[int], Any], fan_out: int = 4
+) -> Iterator[Tuple[int, DataTable]]:
+    """并行获取全部的页, 按页码顺序返回 (页码, DataTable)
+
+    先获取第一页得到 max_page, 之后同时获取最多 fan_out 页; 每取走一页才开始获取下一页,
+    因此最多只保留 fan_out 页数据。各页以低优先级在共享线程池中获取。
+    在工作线程中使用, 停止迭代时取消还未开始的请求。
+    """
+    first = fetch_page(func_fetch, 1)
+    yield 1, first
+    max_page = first.max_page
+    if max_page <= 1:
+        return
+    pool = thread_pool()
+    # 已经提交的页, 按页码顺序取出
+    pending: Dict[int, _FutureRunnable] = {}
+    next_page = 2
+    try:
+        for page in range(2, max_page + 1):
+            while next_page <= max_page and len(pending) < max(fan_out, 1):
+                job = _FutureRunnable(fetch_page, func_fetch, next_page)
+                pool.start(job, PRIORITY_LOW)
+                pending[next_page] = job
+                next_page += 1
+            yield page, pending.pop(page).result()
+    finally:
+        for job in pending.values():
+            job.cancel()
+
+
+class _Runnable(QRunnable):
+
+    def __init__(self, job: "CommonThread"):
+        super().__init__()
+        self.job = job
+
+    def run(self) -> None:
+        self.job.run()
+
+
+class CommonThread(QObject):
+    """在共享线程池中执行的任务
+
+    用法与原来基于 QThread 的实现一致: 通过 on_started/on_success/on_exception/on_finished
+    注册回调后调用 start()。任务按优先级排队, 同时执行的数量受线程池限制, 结束后自动释放。
+    func 为 async def 函数时在共享的事件循环中执行, 不占用线程池。
+    func 返回迭代器(生成器或者异步迭代器)时为流式结果: 第一项通过 on_success 通知,
+    之后的每一项通过 on_chunk 通知。
+    parent 被销毁后不再通知结果。
+    """
+
+    started = pyqtSignal()
+    finished = pyqtSignal()
     # signal_success = pyqtSignal()
     signal_exception = pyqtSignal(Exception)
+    signal_chunk = pyqtSignal(object)
+
+    # 执行中的任务, 保证任务在结束之前不会被回收
+    _running: Set["CommonThread"] = set()
 
     def __init__(self, parent, func: Callable, *args, **kwargs):
-        super().__init__(parent)
+        super().__init__()
+        self.context = parent
         self.func = func
         self.args = args
         self.kwargs = kwargs
+        self.priority = PRIORITY_NORMAL
+        self.finished.connect(self._release)
+
+    def with_priority(self, priority: int):
+        self.priority = priority
+        return self
 
     def on_started(self, *args: Callable[[], None]):
         for func in args:
@@ -40,18 +229,102 @@ class CommonThread(QThread):
             self.signal_exception.connect(func)
         return self
 
+    def on_chunk(self, *args: Callable[[Any], None]):
+        for func in args:
+            self.signal_chunk.connect(func)
+        return self
+
+    def start(self):
+        """提交到线程池, 异步函数提交到事件循环"""
+        CommonThread._running.add(self)
+        if inspect.iscoroutinefunction(self.func) or inspect.isasyncgenfunction(
+            self.func
+        ):
+            asyncio.run_coroutine_threadsafe(self._run_async(), event_loop())
+        else:
+            thread_pool().start(_Runnable(self), self.priority)
+        return self
+
+    def _cancelled(self) -> bool:
+        return isinstance(self.context, QObject) and sip.isdeleted(self.context)
+
+    @pyqtSlot()
+    def _release(self):
+        CommonThread._running.discard(self)
+        self.deleteLater()
+
+    def _emit_success(self, result: Any):
+        signal_success = getattr(self, "signal_success", None)
+        if (
+            signal_success
+            and isinstance(signal_success, pyqtBoundSignal)
+            and not self._cancelled()
+        ):
+            if result is not None:
+                signal_success.emit(result)
+            else:
+                signal_success.emit()
+
+    def _emit_exception(self, e: Exception):
+        if not self._cancelled():
+            self.signal_exception.emit(e)
+
+    def _deliver(self, result: Any):
+        """通知结果, 迭代器的第一项作为结果, 之后的每一项作为数据块"""
+        if not isinstance(result, Iterator):
+            self._emit_success(result)
+            return
+        for i, item in enumerate(result):
+            if self._cancelled():
+                break
+            if i == 0:
+                self._emit_success(item)
+            else:
+                self.signal_chunk.emit(item)
+
+    async def _deliver_async(self, result: Any):
+        if not isinstance(result, AsyncIterator):
+            self._deliver(result)
+            return
+        i = 0
+        async for item in result:
+            if self._cancelled():
+                break
+            if i == 0:
+                self._emit_success(item)
+            else:
+                self.signal_chunk.emit(item)
+            i += 1
+
     def run(self) -> None:
+        self.started.emit()
         try:
             result = self.func(*self.args, **self.kwargs)
+            if inspect.isawaitable(result):
+                # 普通函数返回了协程, 交给事件循环执行并等待结果
+                result = asyncio.run_coroutine_threadsafe(
+                    _awaited(result), event_loop()
+                ).result()
+            if isinstance(result, AsyncIterator):
+                asyncio.run_coroutine_threadsafe(
+                    self._deliver_async(result), event_loop()
+                ).result()
+            else:
+                self._deliver(result)
         except Exception as e:
-            self.signal_exception.emit(e)
-        else:
-            signal_success = getattr(self, "signal_success", None)
-            if signal_success and isinstance(signal_success, pyqtBoundSignal):
-                if result is not None:
-                    signal_success.emit(result)
-                else:
-                    signal_success.emit()
+            self._emit_exception(e)
+        finally:
+            self.finished.emit()
+
+    async def _run_async(self) -> None:
+        self.started.emit()
+        try:
+            result = self.func(*self.args, **self.kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            await self._deliver_async(result)
+        except Exception as e:
+            self._emit_exception(e)
         finally:
             self.finished.emit()
 
@@ -62,3 +335,11 @@ class DataTableThread(CommonThread):
 
 class ListThread(CommonThread):
     signal_success = pyqtSignal()
+
+    def _emit_success(self, result: Any):
+        # 只通知完成, 忽略返回值
+        super()._emit_success(None)
+
+
+class ObjectThread(CommonThread):
+    signal_success = pyqtSignal(object)
@@ -1,23 +1,239 @@
-from typing import Any, List, Mapping, Optional, Union
+import collections.abc
+from array import array
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 
 class TableHeader(BaseModel):
     name: str
     label: Optional[str] = None
     hide: bool = False
+    # 主键列, 刷新时根据主键对比新旧数据, 只更新变化的行
+    primary_key: bool = False
+    # 显示格式, 参见 pydashboard.formatters
+    # 数字: 小数位数, 是否显示千分位
+    precision: Optional[int] = None
+    thousands: bool = False
+    # 日期时间: strftime 格式
+    datetime_format: Optional[str] = None
+    # 布尔值: (真, 假) 显示的文本
+    bool_labels: Optional[Tuple[str, str]] = None
+    # 枚举: {值: 显示的文本}
+    enum_labels: Optional[Dict[Any, str]] = None
+    # 值的类型, 编辑时按类型解析, 参见 pydashboard.schema
+    dtype: Optional[
+        Literal["int", "float", "bool", "str", "datetime", "decimal", "enum"]
+    ] = None
+    # 自定义解析函数, 将输入的文本转换为值, 优先于 dtype
+    parser: Optional[Callable[[str], Any]] = None
+    # 校验函数, 返回 False 或者抛出 ValueError 时拒绝修改
+    validator: Optional[Callable[[Any], Any]] = None
 
     def text(self) -> str:
         return self.label or self.name
 
 
+def _pack_column(values: Sequence[Any]) -> Sequence[Any]:
+    """将全部为整数或浮点数的列压缩为 array, 其他列保持为 list"""
+    if values and all(type(x) is int for x in values):
+        try:
+            return array("q", values)
+        except OverflowError:
+            return list(values)
+    if values and all(type(x) is float for x in values):
+        return array("d", values)
+    return list(values)
+
+
+class RowView(collections.abc.Mapping):
+    """列存储模式下的行视图, 用法与行存储的 dict 一致
+
+    值为 None 的列视为不存在, 与行存储中缺少该键的行为一致。
+    """
+
+    __slots__ = ("_columns", "_row")
+
+    def __init__(self, columns: Mapping[str, Sequence[Any]], row: int):
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        column = self._columns.get(key)
+        if column is None:
+            raise KeyError(key)
+        value = column[self._row]
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return (k for k, v in self._columns.items() if v[self._row] is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
 class DataTable(BaseModel):
-    """数据表模型"""
+    """数据表模型
+
+    支持两种存储方式:
+    - 行存储: data 中每一行是一个 dict
+    - 列存储: columns 中每一列是一个 list 或 array, 通过 from_rows/from_columns 创建
+    """
 
     headers: List[TableHeader] = []
     data: List[Mapping[str, Union[str, int, float, bool, Any]]] = []
+    columns: Dict[str, Any] = {}
     max_page: int = 1
+    # 主键值 -> 行号, 第一次按主键查找时建立, 通过 set_cell/extend 修改时同步更新
+    _key_index: Optional[Dict[Any, int]] = PrivateAttr(default=None)
+
+    @classmethod
+    def from_columns(
+        cls,
+        headers: List[TableHeader],
+        columns: Mapping[str, Sequence[Any]],
+        **kwargs,
+    ) -> "DataTable":
+        """使用列数据创建列存储的数据表, 缺少的列用 None 填充"""
+        size = max((len(x) for x in columns.values()), default=0)
+        packed = {}
+        for header in headers:
+            values = columns.get(header.name)
+            if values is None:
+                packed[header.name] = [None] * size
+            elif len(values) != size:
+                raise ValueError(
+                    f"column {header.name} has {len(values)} rows, expected {size}"
+                )
+            else:
+                packed[header.name] = _pack_column(values)
+        return cls(headers=headers, columns=packed, **kwargs)
+
+    @classmethod
+    def from_rows(
+        cls,
+        headers: List[TableHeader],
+        rows: Sequence[Mapping[str, Any]],
+        **kwargs,
+    ) -> "DataTable":
+        """使用行数据创建列存储的数据表"""
+        return cls.from_columns(
+            headers,
+            {x.name: [row.get(x.name) for row in rows] for x in headers},
+            **kwargs,
+        )
+
+    def is_columnar(self) -> bool:
+        return bool(self.columns)
+
+    def row_count(self) -> int:
+        if self.columns:
+            return len(next(iter(self.columns.values())))
+        return len(self.data)
+
+    def cell(self, row: int, name: str) -> Any:
+        """获取第row行name列的值"""
+        if self.columns:
+            column = self.columns.get(name)
+            return column[row] if column is not None else None
+        return self.data[row].get(name)
+
+    def row(self, n: int) -> Mapping[str, Any]:
+        """获取第n行, 列存储时返回行视图"""
+        if self.columns:
+            return RowView(self.columns, n)
+        return self.data[n]
+
+    def rows(self) -> Iterator[Mapping[str, Any]]:
+        for n in range(self.row_count()):
+            yield self.row(n)
+
+    def column(self, name: str) -> Sequence[Any]:
+        """获取整列数据, 列存储时直接返回该列"""
+        if self.columns:
+            column = self.columns.get(name)
+            return column if column is not None else [None] * self.row_count()
+        return [row.get(name) for row in self.data]
+
+    def set_cell(self, row: int, name: str, value: Any):
+        """修改第row行name列的值"""
+        self._update_key(row, name, self.cell(row, name), value)
+        if not self.columns:
+            self.data[row] = {**self.data[row], name: value}
+            return
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = [None] * self.row_count()
+        try:
+            column[row] = value
+        except (TypeError, OverflowError):
+            column = self.columns[name] = list(column)
+            column[row] = value
+
+    def _update_key(self, row: int, name: str, old: Any, value: Any):
+        if self._key_index is None or name != self.primary_key():
+            return
+        if self._key_index.get(old) == row:
+            del self._key_index[old]
+        self._key_index.setdefault(value, row)
+
+    def extend(self, rows: Sequence[Mapping[str, Any]]):
+        """在末尾追加行"""
+        key = self.primary_key()
+        if self._key_index is not None and key:
+            start = self.row_count()
+            for i, row in enumerate(rows, start):
+                self._key_index.setdefault(row.get(key), i)
+        if not self.columns:
+            self.data.extend(rows)
+            return
+        for header in self.headers:
+            column = self.columns[header.name]
+            values = [row.get(header.name) for row in rows]
+            if not isinstance(column, array):
+                column.extend(values)
+                continue
+            try:
+                column.extend(array(column.typecode, values))
+            except (TypeError, OverflowError):
+                # 追加的值与 array 的类型不一致时改为 list
+                self.columns[header.name] = list(column) + values
+
+    def primary_key(self) -> Optional[str]:
+        """主键列名"""
+        for header in self.headers:
+            if header.primary_key:
+                return header.name
+        return None
+
+    def find_row(self, key: Any) -> Optional[int]:
+        """按主键查找行号, 主键重复时返回第一行; 没有主键或找不到时返回 None"""
+        if self._key_index is None:
+            name = self.primary_key()
+            if not name:
+                return None
+            index: Dict[Any, int] = {}
+            for i, value in enumerate(self.column(name)):
+                index.setdefault(value, i)
+            self._key_index = index
+        return self._key_index.get(key)
 
     def header_rename(self) -> Mapping[str, str]:
         return {x.name: x.label or x.name for x in self.headers}
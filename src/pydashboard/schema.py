@@ -0,0 +1,109 @@
+import datetime
+import decimal
+from typing import Any, Callable, Dict, Iterable
+
+from pydashboard.models import TableHeader
+
+Parser = Callable[[Any], Any]
+
+_TRUE = {"true", "1", "yes", "y", "on", "是"}
+_FALSE = {"false", "0", "no", "n", "off", "否"}
+
+
+def _number(text: str) -> str:
+    return text.strip().replace(",", "")
+
+
+def _parse_bool(header: TableHeader) -> Parser:
+    true_texts, false_texts = set(_TRUE), set(_FALSE)
+    if header.bool_labels:
+        true_texts.add(header.bool_labels[0].lower())
+        false_texts.add(header.bool_labels[1].lower())
+
+    def parse(text: str) -> bool:
+        value = text.strip().lower()
+        if value in true_texts:
+            return True
+        if value in false_texts:
+            return False
+        raise ValueError(f"invalid bool: {text}")
+
+    return parse
+
+
+def _parse_datetime(header: TableHeader) -> Parser:
+    def parse(text: str) -> datetime.datetime:
+        text = text.strip()
+        if header.datetime_format:
+            try:
+                return datetime.datetime.strptime(text, header.datetime_format)
+            except ValueError:
+                pass
+        return datetime.datetime.fromisoformat(text)
+
+    return parse
+
+
+def _parse_enum(header: TableHeader) -> Parser:
+    # 可以输入值或者显示的文本
+    values: Dict[str, Any] = {}
+    for key, label in (header.enum_labels or {}).items():
+        values[label] = key
+        values[str(key)] = key
+
+    def parse(text: str) -> Any:
+        text = text.strip()
+        if text not in values:
+            raise ValueError(f"invalid value: {text}")
+        return values[text]
+
+    return parse
+
+
+def _parse_decimal(text: str) -> decimal.Decimal:
+    try:
+        return decimal.Decimal(_number(text))
+    except decimal.InvalidOperation as e:
+        raise ValueError(f"invalid decimal: {text}") from e
+
+
+_PARSERS: Dict[str, Callable[[TableHeader], Parser]] = {
+    "int": lambda header: lambda text: int(_number(text)),
+    "float": lambda header: lambda text: float(_number(text)),
+    "decimal": lambda header: _parse_decimal,
+    "bool": _parse_bool,
+    "datetime": _parse_datetime,
+    "enum": _parse_enum,
+    "str": lambda header: str,
+}
+
+
+def compile_parser(header: TableHeader) -> Parser:
+    """根据列的类型生成解析函数, 将编辑器中输入的文本转换为该列类型的值
+
+    有类型的列中空文本解析为 None, 不是字符串的值不解析; 无法解析或者 validator 返回 False 时抛出 ValueError。
+    """
+    if header.parser is not None:
+        parse_text = header.parser
+    elif header.dtype is not None:
+        parse_text = _PARSERS[header.dtype](header)
+    else:
+        parse_text = None
+    validator = header.validator
+
+    def parse(value: Any) -> Any:
+        if isinstance(value, str):
+            if header.dtype not in (None, "str") and not value.strip():
+                return None
+            if parse_text is not None:
+                value = parse_text(value)
+        if validator is not None and value is not None and validator(value) is False:
+            raise ValueError(f"invalid value for {header.name}: {value}")
+        return value
+
+    return parse
+
+
+def compile_parsers(headers: Iterable[TableHeader]) -> Dict[str, Parser]:
+    """每一列的解析函数 {列名: 解析函数}"""
+    return {x.name: compile_parser(x) for x in headers}
@@ -0,0 +1,85 @@
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pydashboard.formatters import compile_formatters
+from pydashboard.models import DataTable
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value).lower()
+
+
+class SearchIndex:
+    """快速过滤使用的索引
+
+    每列建立 n-gram 倒排索引, 查询时先用 n-gram 求出候选行, 再逐行确认;
+    新的查询包含上一次的查询时(继续输入), 只在上一次的结果中查找。
+    索引只覆盖 source 中的数据, 查询结果为 source 中的行号。
+    按列的格式显示后的文本建立索引, 与表格中看到的内容一致。
+    """
+
+    def __init__(self, source: DataTable, n: int = 3):
+        self.source = source
+        self.n = n
+        # 每行所有列的文本, 用于确认候选行
+        self._texts: List[str] = []
+        # {列名: {n-gram: 行号集合}}
+        self._grams: Dict[str, Dict[str, Set[int]]] = {}
+        self._last_query: Optional[str] = None
+        self._last_result: Set[int] = set()
+        self._build()
+
+    def _build(self):
+        names = self.source.header_names()
+        formatters = compile_formatters(self.source.headers)
+        columns = [
+            [_text(x) for x in map(formatters[name], self.source.column(name))]
+            for name in names
+        ]
+        n = self.n
+        for name, texts in zip(names, columns):
+            grams: Dict[str, Set[int]] = {}
+            for row, text in enumerate(texts):
+                for gram in {text[i : i + n] for i in range(len(text) - n + 1)}:
+                    rows = grams.get(gram)
+                    if rows is None:
+                        grams[gram] = {row}
+                    else:
+                        rows.add(row)
+            self._grams[name] = grams
+        # 列之间用 \0 分隔, 避免匹配到跨列的文本
+        self._texts = ["\0".join(x) for x in zip(*columns)]
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        if self._last_query is not None and self._last_query in query:
+            return self._last_result
+        if len(query) < self.n:
+            return range(len(self._texts))
+        grams = {query[i : i + self.n] for i in range(len(query) - self.n + 1)}
+        candidates: Set[int] = set()
+        for column in self._grams.values():
+            rows: Optional[Set[int]] = None
+            for gram in grams:
+                matched = column.get(gram)
+                if not matched:
+                    rows = None
+                    break
+                rows = set(matched) if rows is None else rows & matched
+                if not rows:
+                    break
+            if rows:
+                candidates |= rows
+        return candidates
+
+    def search(self, query: str) -> Set[int]:
+        """查找任意一列包含 query 的行, 不区分大小写"""
+        query = query.lower()
+        texts = self._texts
+        result = {x for x in self._candidates(query) if query in texts[x]}
+        self._last_query, self._last_result = query, result
+        return set(result)
+
+    @staticmethod
+    def match(values: Iterable[Any], query: str) -> bool:
+        """判断一行显示的文本是否匹配, 用于没有被索引的行(新增、编辑过的行)"""
+        query = query.lower()
+        return any(query in _text(x) for x in values)
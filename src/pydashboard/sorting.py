@@ -0,0 +1,130 @@
+import decimal
+from bisect import bisect_right
+from functools import cmp_to_key
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+SortColumns = Tuple[Tuple[str, bool], ...]
+
+_NONE_KEY = (3, 0)
+_NONE_KEY_DESC = (-1, 0)
+
+
+def sort_key(value: Any) -> Tuple[int, Any]:
+    """转换为可以互相比较的排序键: 数字 < 字符串 < 其他类型 < None"""
+    if value is None or value == "":
+        return _NONE_KEY
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    try:
+        value < value
+    except TypeError:
+        return (2, str(value))
+    return (2, value)
+
+
+class SortIndex:
+    """排序索引
+
+    每列的排序键只提取一次, 排序结果按 ((列名, 是否降序), ...) 缓存,
+    数据变化时由模型调用 changed/rows_changed/reset 使缓存失效。
+    排序结果是行标识的排列, 不会移动数据。
+    """
+
+    def __init__(self, value: Callable[[int, str], Any]):
+        self._value = value
+        self._keys: Dict[str, Dict[int, Tuple[int, Any]]] = {}
+        self._orders: Dict[SortColumns, List[int]] = {}
+
+    def reset(self):
+        """数据整体变化"""
+        self._keys.clear()
+        self._orders.clear()
+
+    def rows_changed(self):
+        """新增或删除了行, 已经提取的排序键仍然有效"""
+        self._orders.clear()
+
+    def changed(self, row_id: int, name: str):
+        """单元格的值发生变化"""
+        keys = self._keys.get(name)
+        if keys is not None:
+            keys[row_id] = sort_key(self._value(row_id, name))
+        for columns in [x for x in self._orders if any(n == name for n, _ in x)]:
+            del self._orders[columns]
+
+    def _column_keys(
+        self, name: str, row_ids: Sequence[int]
+    ) -> Dict[int, Tuple[int, Any]]:
+        keys = self._keys.setdefault(name, {})
+        for row_id in row_ids:
+            if row_id not in keys:
+                keys[row_id] = sort_key(self._value(row_id, name))
+        return keys
+
+    def sort(self, row_ids: Sequence[int], columns: SortColumns) -> List[int]:
+        """按多列稳定排序, 返回排序后的行标识"""
+        order = self._orders.get(columns)
+        if order is not None and len(order) == len(row_ids):
+            return list(order)
+        order = self._sorted(row_ids, columns)
+        self._orders[columns] = order
+        return list(order)
+
+    def merge(
+        self, order: Sequence[int], row_ids: Sequence[int], columns: SortColumns
+    ) -> List[int]:
+        """将新的行合并到已经按 columns 排序的 order 中, 只对新的行排序
+
+        用于流式加载时追加行, 每个新的行二分查找插入位置; 相同的值 order 中的行在前,
+        与整体稳定排序的结果一致。
+        """
+        added = self._sorted(row_ids, columns)
+        column_keys = [
+            (name, self._column_keys(name, added), desc) for name, desc in columns
+        ]
+
+        def compare(a: int, b: int) -> int:
+            for name, keys, desc in column_keys:
+                x, y = keys.get(a), keys.get(b)
+                # order 中的行在 reset 之后可能还没有提取排序键
+                if x is None:
+                    x = keys[a] = sort_key(self._value(a, name))
+                if y is None:
+                    y = keys[b] = sort_key(self._value(b, name))
+                if x == y:
+                    continue
+                if not desc:
+                    return 1 if x > y else -1
+                # 降序时 None 仍然排在最后
+                x = _NONE_KEY_DESC if x is _NONE_KEY else x
+                y = _NONE_KEY_DESC if y is _NONE_KEY else y
+                return -1 if x > y else 1
+            return 0
+
+        key = cmp_to_key(compare)
+        merged: List[int] = []
+        start = 0
+        for row_id in added:
+            at = bisect_right(order, key(row_id), start, key=key)
+            merged.extend(order[start:at])
+            merged.append(row_id)
+            start = at
+        merged.extend(order[start:])
+        self._orders[columns] = merged
+        return list(merged)
+
+    def _sorted(self, row_ids: Sequence[int], columns: SortColumns) -> List[int]:
+        order = list(row_ids)
+        # 从最后一个排序列开始依次稳定排序
+        for name, desc in reversed(columns):
+            keys = self._column_keys(name, order)
+            if desc:
+                order.sort(
+                    key=lambda x: _NONE_KEY_DESC if keys[x] is _NONE_KEY else keys[x],
+                    reverse=True,
+                )
+            else:
+                order.sort(key=keys.__getitem__)
+        return order